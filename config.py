@@ -1,5 +1,9 @@
 # config.py
 
+import os
+
+_dir_pipeline = os.path.dirname(os.path.abspath(__file__))
+
 # --- Colunas de interesse no tsv do InterProScan (sem header) ---
 coluna_id = 0       # ID da protein
 coluna_metodo = 3   # análise/DB
@@ -7,10 +11,116 @@ coluna_output = 5   # -o de acordo com a análise
 coluna_start = 6    # start do -o
 coluna_end = 7      # end do -o
 
+# Linhas do TSV do InterPro lidas por vez na Função 1. O arquivo é lido em
+# blocos (só as colunas acima), então o uso de memória não cresce com ele.
+interpro_chunksize = 500000
+# Cache colunar do TSV (arquivos binários por método em results/interpro_cache),
+# criado na primeira leitura e reaproveitado enquanto o TSV não mudar.
+interpro_cache = True
+interpro_cache_dir = os.path.join(_dir_pipeline, "results", "interpro_cache")
+
+# --- Configurações dos FASTAs individuais (Função 2) ---
+# "arquivos": um .fasta por sequência em Funcao2b (padrão).
+# "pacote": um único <nome>.pack.sqlite por FASTA de origem, lido direto
+# pelo BLAST e pelo MODELLER (evita centenas de milhares de arquivos).
+fastas_individuais_formato = "arquivos"
+# No modo "pacote", também grava os .fasta individuais (exportação opcional).
+fastas_individuais_exportar = False
+
 # --- Configurações do BLAST ---
 # Define o número máximo de sequências alvo (hits) que o BLAST deve retornar.
 blast_max_target_seqs = 10
+# E-value máximo aceito pelo BLAST.
+blast_evalue = "1e-5"
+
+# Modo de busca: "remoto" (blastp -db pdb -remote, fila do NCBI) ou
+# "local" (banco criado com makeblastdb a partir do pdb_seqres do RCSB).
+blast_modo = "remoto"
+# FASTA de sequências do PDB (https://files.rcsb.org/pub/pdb/derived_data/pdb_seqres.txt).
+blast_pdb_seqres = os.path.join(_dir_pipeline, "blast_db", "pdb_seqres.txt")
+# Prefixo do banco local (reconstruído só quando o pdb_seqres muda).
+blast_db_local = os.path.join(_dir_pipeline, "blast_db", "pdb_local")
+# Threads usadas por cada blastp no modo local (-num_threads).
+blast_num_threads = 4
+# Quantas sequências juntar em cada chamada do blastp (0 = um blastp por arquivo .fasta).
+# Lotes grandes evitam recarregar o banco para cada uma das milhares de queries curtas.
+blast_tamanho_lote = 0
+# Quantos jobs de blastp (arquivos ou lotes) rodar ao mesmo tempo.
+# No modo local, jobs x blast_num_threads não deve passar do número de núcleos.
+blast_max_jobs_paralelos = 1
+# Cache persistente (SQLite) dos hits por sequência: a chave é o hash dos resíduos
+# + banco + e-value + max_target_seqs, então queries idênticas são buscadas uma só vez.
+blast_cache = True
+blast_cache_path = os.path.join(_dir_pipeline, "results", "blast_cache.sqlite")
+
+# --- Configurações do alinhamento (Clustal Omega / EBI) ---
+# Backend: "ebi" (serviço REST), "clustalo" ou "mafft" (binários locais).
+align_backend = "ebi"
+clustalo_bin = "clustalo"
+mafft_bin = "mafft"
+# Threads de cada alinhamento local e quantos arquivos alinhar ao mesmo tempo.
+align_threads = 4
+align_max_paralelo = 2
+# Modo incremental (só backends locais): se a família já tem alinhamento em
+# Funcao4, adiciona apenas as sequências novas (alinhamento contra o perfil)
+# e regenera o consenso dela em Funcao5.
+align_incremental = False
+# URL base do serviço REST (pode apontar para um servidor local de testes).
+clustalo_base_url = "https://www.ebi.ac.uk/Tools/services/rest/clustalo"
+# Modo assíncrono: submete todos os arquivos de uma vez em vez de um por vez.
+clustalo_async = False
+# Máximo de jobs ativos ao mesmo tempo no modo assíncrono.
+clustalo_max_jobs = 5
+# Intervalo de consulta do status (segundos): começa no inicial e cresce 1.5x até o máximo.
+clustalo_intervalo_inicial = 5
+clustalo_intervalo_maximo = 60
+
+# --- Configurações do consenso ---
+# Quantos processos usar para gerar os consensos de um diretório (1 = sem pool).
+consenso_max_processos = 1
+# Modo streaming: em vez de carregar o alinhamento inteiro com o AlignIO, grava
+# os resíduos numa matriz em disco (memmap) e conta em blocos de linhas.
+# Use para famílias muito grandes; o resultado é idêntico ao modo em memória.
+consenso_streaming = False
+# Sequências lidas por vez no modo streaming (limita o pico de memória).
+consenso_linhas_por_bloco = 65536
+# Pasta para a matriz temporária (None = pasta temporária do sistema).
+consenso_dir_temporario = None
+# Pondera as sequências pelos pesos de Henikoff (baseados em posição) ao
+# calcular resíduo consenso, frequências e alertas. Útil quando a família
+# tem muitos parálogos quase idênticos.
+consenso_ponderado = False
+
+# --- Configurações do download de PDBs (Função 6) ---
+# Endereço dos arquivos (pode apontar para um servidor local de testes).
+# Baixa '<CODIGO>.pdb.gz' e, se não existir, '<CODIGO>.pdb'.
+pdb_base_url = "https://files.rcsb.org/download"
+# Downloads simultâneos (threads e conexões do pool HTTP compartilhado).
+pdb_max_downloads = 10
+# Máximo de requisições iniciadas por segundo, somando as threads (0 = sem limite).
+pdb_requisicoes_por_segundo = 20
+# Tentativas por arquivo em erros transitórios (conexão, timeout, 429/5xx),
+# com espera que começa em 'pdb_backoff_inicial' segundos e dobra a cada vez.
+pdb_tentativas = 4
+pdb_backoff_inicial = 1
+pdb_timeout = 30
+# Espelho local do PDB no layout 'divided' (rsync do wwPDB), ou seja, a pasta
+# que contém 'xy/pdb1xyz.ent.gz'. Se definido, é consultado antes da rede;
+# com 'pdb_espelho_usar_rede = False' os códigos ausentes no espelho não são baixados.
+pdb_espelho_dir = None
+pdb_espelho_usar_rede = True
+# Repositório único de moldes: cada código é baixado uma só vez e as pastas
+# da Função 6 e os 'Moldes' da Função 7 recebem hard links (ou symlinks/cópias).
+pdb_store = True
+pdb_store_dir = os.path.join(_dir_pipeline, "results", "pdb_store")
 
 # --- Configurações do MODELLER ---
 # Define quantos modelos (PDBs) o MODELLER deve gerar.
-modeller_ending_model = 5
\ No newline at end of file
+modeller_ending_model = 5
+# Índice das sequências-alvo (pasta da query -> sequência em F5, F2b ou F2a),
+# atualizado só para os arquivos novos ou alterados a cada execução.
+modeller_indice_alvos = os.path.join(_dir_pipeline, "results", "indice_alvos.sqlite")
+
+# --- Configurações do modo headless (python main.py --headless) ---
+# Número máximo de etapas independentes executadas ao mesmo tempo.
+pipeline_max_etapas_paralelas = 3
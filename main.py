@@ -2,6 +2,7 @@
 
 import os
 import sys
+import argparse
 import config 
 
 from pipeline_utils import filter_utils
@@ -12,6 +13,7 @@ from pipeline_utils import model_utils
 from pipeline_utils import consensus_utils
 from pipeline_utils import pdb_utils
 from pipeline_utils import modeller_utils 
+from pipeline_utils import dag_utils
 
 def encontrar_arquivo_input(diretorio, extensoes, tipo_arquivo):
     """
@@ -44,7 +46,24 @@ def encontrar_arquivo_input(diretorio, extensoes, tipo_arquivo):
                 return os.path.join(diretorio, arquivos[idx])
         print("Seleção inválida.")
 
+def ler_argumentos():
+    """
+    Lê os argumentos da linha de comando. Sem '--headless', o menu interativo é usado.
+    """
+    parser = argparse.ArgumentParser(description="Pipeline de bioinformática estrutural (Funções 1-7).")
+    parser.add_argument("--headless", action="store_true",
+                        help="Executa sem menus, como um grafo de dependências entre as etapas.")
+    parser.add_argument("--config", help="Arquivo JSON com os parâmetros do modo headless.")
+    parser.add_argument("--etapas", help="Etapas a executar, ex: 1,2,3 (padrão: todas).")
+    parser.add_argument("--tsv", help="Arquivo InterPro TSV de entrada.")
+    parser.add_argument("--fasta", help="Arquivo FASTA de entrada.")
+    parser.add_argument("--metodo", help="Método (análise) do InterPro a filtrar.")
+    parser.add_argument("--outputs", help="Resultados de interesse separados por ';'.")
+    parser.add_argument("--max-paralelo", type=int, help="Máximo de etapas simultâneas.")
+    return parser.parse_args()
+
 def main():
+    args = ler_argumentos()
     
     # --- 1. Configuração de Diretórios Base ---
     dir_pipeline = os.path.dirname(os.path.abspath(__file__)) 
@@ -73,6 +92,27 @@ def main():
     print(f"Pasta de Input: {dir_input}")
     print(f"Pasta de Resultados: {dir_results}")
 
+    # --- Modo Headless ---
+    if args.headless:
+        dirs = {
+            "input": dir_input, "Funcao1": dir_f1, "Funcao2a": dir_f2a, "Funcao2b": dir_f2b,
+            "Funcao3": dir_f3, "Funcao4": dir_f4, "Funcao5": dir_f5, "Funcao6": dir_f6, "Funcao7": dir_f7,
+        }
+        try:
+            parametros = dag_utils.carregar_parametros(args.config, {
+                "etapas": args.etapas.split(",") if args.etapas else None,
+                "input_tsv": os.path.abspath(args.tsv) if args.tsv else None,
+                "input_fasta": os.path.abspath(args.fasta) if args.fasta else None,
+                "metodo": args.metodo,
+                "outputs": [o.strip() for o in args.outputs.split(";")] if args.outputs else None,
+                "max_etapas_paralelas": args.max_paralelo,
+            })
+            status = dag_utils.executar_pipeline(dirs, parametros)
+        except ValueError as e:
+            print(f"\n[ERRO] {e}")
+            sys.exit(2)
+        sys.exit(0 if all(s == "ok" for s in status.values()) else 1)
+
     # --- 4. Detecção Automática de Inputs ---
     input_tsv = encontrar_arquivo_input(dir_input, (".tsv"), "InterPro TSV")
     input_fasta = encontrar_arquivo_input(dir_input, (".fasta"), "Sequências FASTA")
@@ -116,7 +156,8 @@ def main():
                 print(f"\n[Parte 2a] Extraindo domínios...")
                 extract_utils.extrair_outputs_fasta(
                     df_filtrado, dominios_escolhidos, metodo_usado, 
-                    dir_f1, dir_f2a   
+                    dir_f1, dir_f2a,
+                    caminho_fasta_origem=input_fasta
                 )
                 print("\nFunção 1 concluída! Arquivos salvos em 'Funcao1_Filtrar' e 'Funcao2a_Separar'.")
             else:
@@ -177,11 +218,10 @@ def main():
                     if escolha == '0': pastas_proc = subpastas
                     elif escolha.isdigit() and 1 <= int(escolha) <= len(subpastas):
                         pastas_proc.append(subpastas[int(escolha)-1])
-                    for p in pastas_proc:
-                        s_dir = os.path.join(dir_f2b, p)
-                        t_dir = os.path.join(target_dir, p)
-                        os.makedirs(t_dir, exist_ok=True)
-                        blast_utils.rodar_blast(s_dir, t_dir, automatico=True)
+                    if pastas_proc:
+                        blast_utils.rodar_blast_em_subpastas(dir_f2b, target_dir, pastas_proc)
+                    else:
+                        print("Seleção inválida.")
                 except Exception as e: print(f"Erro: {e}")
 
             elif escolha_fonte == '4':
@@ -198,11 +238,10 @@ def main():
                     if escolha == '0': pastas_proc = subpastas
                     elif escolha.isdigit() and 1 <= int(escolha) <= len(subpastas):
                         pastas_proc.append(subpastas[int(escolha)-1])
-                    for p in pastas_proc:
-                        s_dir = os.path.join(dir_f5, p)
-                        t_dir = os.path.join(target_dir, p) 
-                        os.makedirs(t_dir, exist_ok=True)
-                        blast_utils.rodar_blast(s_dir, t_dir, automatico=True)
+                    if pastas_proc:
+                        blast_utils.rodar_blast_em_subpastas(dir_f5, target_dir, pastas_proc)
+                    else:
+                        print("Seleção inválida.")
                 except Exception as e: print(f"Erro: {e}")
 
         # --- OPÇÃO 4: ALINHAMENTO ---
@@ -216,7 +255,7 @@ def main():
                 else: print("Seleção inválida.")
             print(f"Lendo FASTAs de: {source_dir}")
             print(f"Salvando em: {dir_f4}")
-            align_utils.alinhar_dominios_clustalo_online(source_dir, dir_f4)
+            align_utils.alinhar_dominios_clustalo_online(source_dir, dir_f4, dir_escrita_consensus=dir_f5)
         
         # --- OPÇÃO 5: CONSENSO ---
         elif opcao == '5':
@@ -1,18 +1,295 @@
 """
-Módulo para a Função 3: Alinhar domínios usando Clustal Omega (EBI).
+Módulo para a Função 3: Alinhar domínios usando Clustal Omega (EBI)
+ou um alinhador local (Clustal Omega / MAFFT).
 """
 
 import os
 import requests
 import time
+import asyncio
+import concurrent.futures
+import contextlib
+import shutil
+import subprocess
+import tempfile
+from requests.adapters import HTTPAdapter
 from Bio import AlignIO
+from Bio import SeqIO
 from io import StringIO
+import config
+from pipeline_utils import consensus_utils
 
-def alinhar_dominios_clustalo_online(dir_leitura_fasta, dir_escrita_align):
+# Status finais de um job no serviço REST do EBI.
+STATUS_FINAIS = ("FINISHED", "ERROR", "FAILURE", "NOT_FOUND")
+
+def _url(caminho):
+    """Monta a URL do serviço Clustal Omega a partir de 'config.clustalo_base_url'."""
+    return f"{config.clustalo_base_url.rstrip('/')}/{caminho}"
+
+def _parametros_job(seq_data, email_usuario):
+    return {
+        'email': email_usuario,
+        'stype': 'protein',
+        'sequence': seq_data,
+        'outfmt': 'clustal',
+        'guidetreeout': 'true', 
+    }
+
+def _salvar_resultados(arquivo_fasta, dir_escrita_align, aln_text, tree_text):
+    """
+    Salva alinhamento e árvore em 'Funcao4_AlinhamentoMultiplo/<nome_base>/'.
+    Retorna o alinhamento lido pelo Biopython.
+    """
+    nome_base = os.path.splitext(arquivo_fasta)[0]
+    pasta_saida_especifica = os.path.join(dir_escrita_align, nome_base)
+    os.makedirs(pasta_saida_especifica, exist_ok=True)
+    print(f"Salvando resultados em: {pasta_saida_especifica}")
+
+    arquivo_alinhado = os.path.join(pasta_saida_especifica, f"{nome_base}_clustalo_alinhamento.clustal")
+    with open(arquivo_alinhado, 'w') as f:
+        f.write(aln_text)
+    print(f"Alinhamento salvo em: {arquivo_alinhado}")
+
+    alignment = AlignIO.read(StringIO(aln_text), "clustal")
+    print(f"✓ {len(alignment)} sequências alinhadas ({alignment.get_alignment_length()} posições)")
+
+    arquivo_tree = os.path.join(pasta_saida_especifica, f"{nome_base}_tree.nwk")
+    with open(arquivo_tree, 'w') as f:
+        f.write(tree_text)
+    print(f"Árvore salva em: {arquivo_tree}")
+
+    return alignment
+
+def _comando_alinhador_local(entrada, saida_aln, saida_tree):
+    """
+    Monta o comando do alinhador local (Clustal Omega ou MAFFT).
+    Retorna (comando, escreve_em_stdout).
+    """
+    threads = str(config.align_threads)
+    if config.align_backend == "clustalo":
+        return [
+            config.clustalo_bin, "-i", entrada, "-o", saida_aln,
+            "--outfmt=clustal", f"--guidetree-out={saida_tree}",
+            f"--threads={threads}", "--force",
+        ], False
+    if config.align_backend == "mafft":
+        # O MAFFT grava a árvore em '<entrada>.tree' e o alinhamento no stdout
+        return [
+            config.mafft_bin, "--auto", "--amino", "--preservecase",
+            "--thread", threads, "--clustalout", "--treeout", entrada,
+        ], True
+    raise ValueError(f"align_backend desconhecido: {config.align_backend}")
+
+def _alinhar_arquivo_local(arquivo_fasta, dir_leitura_fasta, dir_escrita_align):
+    """
+    Alinha um FASTA com o binário local, em uma pasta temporária,
+    e salva as mesmas saídas do modo online.
+    """
+    print(f"Alinhando {arquivo_fasta} ({config.align_backend}, {config.align_threads} threads)...")
+    with tempfile.TemporaryDirectory() as tmp:
+        entrada = os.path.join(tmp, "entrada.fasta")
+        shutil.copyfile(os.path.join(dir_leitura_fasta, arquivo_fasta), entrada)
+        saida_aln = os.path.join(tmp, "alinhamento.clustal")
+        saida_tree = os.path.join(tmp, "arvore.nwk")
+
+        comando, usa_stdout = _comando_alinhador_local(entrada, saida_aln, saida_tree)
+        with open(saida_aln, 'w') if usa_stdout else contextlib.nullcontext() as f_out:
+            resultado = subprocess.run(comando, stdout=f_out, stderr=subprocess.PIPE, text=True)
+        if resultado.returncode != 0:
+            raise RuntimeError(resultado.stderr.strip() or f"{comando[0]} saiu com código {resultado.returncode}")
+        if usa_stdout:
+            saida_tree = entrada + ".tree"
+
+        with open(saida_aln, 'r') as f:
+            aln_text = f.read()
+        tree_text = ""
+        if os.path.exists(saida_tree):
+            with open(saida_tree, 'r') as f:
+                tree_text = f.read()
+
+    return _salvar_resultados(arquivo_fasta, dir_escrita_align, aln_text, tree_text)
+
+def _caminho_alinhamento(dir_escrita_align, arquivo_fasta):
+    nome_base = os.path.splitext(arquivo_fasta)[0]
+    return os.path.join(dir_escrita_align, nome_base, f"{nome_base}_clustalo_alinhamento.clustal")
+
+def _alinhar_arquivo_incremental(arquivo_fasta, dir_leitura_fasta, dir_escrita_align):
+    """
+    Adiciona ao alinhamento existente da família só as sequências novas do FASTA,
+    por alinhamento contra o perfil (clustalo --profile1 / mafft --add).
+    Retorna (alinhamento, número de sequências novas).
+    """
+    caminho_aln = _caminho_alinhamento(dir_escrita_align, arquivo_fasta)
+    existente = AlignIO.read(caminho_aln, "clustal")
+    ids_alinhados = {record.id for record in existente}
+    novas = [r for r in SeqIO.parse(os.path.join(dir_leitura_fasta, arquivo_fasta), "fasta")
+             if r.id not in ids_alinhados]
+
+    if not novas:
+        print(f"{arquivo_fasta}: alinhamento já contém todas as sequências.")
+        return existente, 0
+
+    print(f"Adicionando {len(novas)} sequência(s) nova(s) ao alinhamento de {arquivo_fasta} ({config.align_backend})...")
+    threads = str(config.align_threads)
+    with tempfile.TemporaryDirectory() as tmp:
+        perfil = os.path.join(tmp, "perfil.fasta")
+        entrada = os.path.join(tmp, "novas.fasta")
+        saida_aln = os.path.join(tmp, "alinhamento.clustal")
+        AlignIO.write(existente, perfil, "fasta")
+        SeqIO.write(novas, entrada, "fasta")
+
+        if config.align_backend == "clustalo":
+            comando = [
+                config.clustalo_bin, "-i", entrada, "--profile1", perfil, "-o", saida_aln,
+                "--outfmt=clustal", f"--threads={threads}", "--force",
+            ]
+            resultado = subprocess.run(comando, stderr=subprocess.PIPE, text=True)
+        else:
+            comando = [
+                config.mafft_bin, "--amino", "--preservecase", "--thread", threads,
+                "--clustalout", "--add", entrada, perfil,
+            ]
+            with open(saida_aln, 'w') as f_out:
+                resultado = subprocess.run(comando, stdout=f_out, stderr=subprocess.PIPE, text=True)
+        if resultado.returncode != 0:
+            raise RuntimeError(resultado.stderr.strip() or f"{comando[0]} saiu com código {resultado.returncode}")
+
+        shutil.copyfile(saida_aln, caminho_aln)
+
+    alinhamento = AlignIO.read(caminho_aln, "clustal")
+    print(f"✓ {len(alinhamento)} sequências alinhadas ({alinhamento.get_alignment_length()} posições). "
+          f"A árvore guia anterior foi mantida.")
+    return alinhamento, len(novas)
+
+def _alinhar_todos_local(arquivos_escolhidos, dir_leitura_fasta, dir_escrita_align, dir_escrita_consensus=None):
+    """
+    Roda até 'config.align_max_paralelo' alinhamentos locais ao mesmo tempo.
+    Com 'config.align_incremental', famílias que já têm alinhamento recebem só
+    as sequências novas e, se 'dir_escrita_consensus' for informado, têm o
+    consenso regenerado. Retorna {arquivo: alinhamento} dos arquivos alinhados com sucesso.
+    """
+    resultados = {}
+    atualizados = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, config.align_max_paralelo)) as executor:
+        future_to_arquivo = {}
+        for arquivo in arquivos_escolhidos:
+            if config.align_incremental and os.path.exists(_caminho_alinhamento(dir_escrita_align, arquivo)):
+                future = executor.submit(_alinhar_arquivo_incremental, arquivo, dir_leitura_fasta, dir_escrita_align)
+            else:
+                future = executor.submit(_alinhar_arquivo_local, arquivo, dir_leitura_fasta, dir_escrita_align)
+            future_to_arquivo[future] = arquivo
+
+        for future in concurrent.futures.as_completed(future_to_arquivo):
+            arquivo = future_to_arquivo[future]
+            try:
+                resultado = future.result()
+            except FileNotFoundError:
+                print(f"[ERRO] {arquivo}: binário '{config.align_backend}' não encontrado. Verifique a instalação.")
+                continue
+            except Exception as e:
+                print(f"[ERRO] {arquivo}: {e}. Arquivo pulado.")
+                continue
+
+            if isinstance(resultado, tuple):
+                resultado, n_novas = resultado
+                if n_novas:
+                    atualizados.append(arquivo)
+            resultados[arquivo] = resultado
+
+    if atualizados and dir_escrita_consensus:
+        print("\nRegenerando consenso das famílias atualizadas...")
+        for arquivo in sorted(atualizados):
+            nome_base = os.path.splitext(arquivo)[0]
+            caminho_aln = _caminho_alinhamento(dir_escrita_align, arquivo)
+            try:
+                # Mesma semente da Função 5, para que os empates deem o mesmo consenso.
+                nome_consenso, seq = consensus_utils.gerar_consenso_e_relatorio(
+                    caminho_aln, formato="clustal",
+                    pasta_saida=os.path.join(dir_escrita_consensus, nome_base),
+                    semente=os.path.relpath(caminho_aln, dir_escrita_align)
+                )
+                consensus_utils.atualizar_fasta_geral(dir_escrita_consensus, nome_consenso, seq)
+            except Exception as e:
+                print(f"[ERRO] Consenso de {arquivo}: {e}")
+
+    return {a: resultados[a] for a in arquivos_escolhidos if a in resultados}
+
+async def _get_texto(sessao, url):
+    resp = await asyncio.to_thread(sessao.get, url, timeout=60)
+    resp.raise_for_status()
+    return resp.text
+
+async def _alinhar_arquivo_async(sessao, semaforo, arquivo_fasta, dir_leitura_fasta, dir_escrita_align, email_usuario):
+    """
+    Submete um FASTA, acompanha o job com intervalo crescente (backoff)
+    e baixa alinhamento e árvore em paralelo.
+    """
+    async with semaforo:
+        with open(os.path.join(dir_leitura_fasta, arquivo_fasta), 'r') as f:
+            seq_data = f.read()
+
+        resp = await asyncio.to_thread(sessao.post, _url("run/"), data=_parametros_job(seq_data, email_usuario), timeout=60)
+        resp.raise_for_status()
+        job_id = resp.text.strip()
+        print(f"Job enviado ({arquivo_fasta})! ID: {job_id}")
+
+        intervalo = config.clustalo_intervalo_inicial
+        status = ""
+        while status not in STATUS_FINAIS:
+            await asyncio.sleep(intervalo)
+            intervalo = min(intervalo * 1.5, config.clustalo_intervalo_maximo)
+            status = (await _get_texto(sessao, _url(f"status/{job_id}"))).strip()
+            print(f"Status do job ({arquivo_fasta}): {status}")
+
+        if status != "FINISHED":
+            raise RuntimeError(f"job {job_id} terminou com status {status}")
+
+        aln_text, tree_text = await asyncio.gather(
+            _get_texto(sessao, _url(f"result/{job_id}/aln-clustal")),
+            _get_texto(sessao, _url(f"result/{job_id}/tree")),
+        )
+        return _salvar_resultados(arquivo_fasta, dir_escrita_align, aln_text, tree_text)
+
+async def _alinhar_todos_async(arquivos_escolhidos, dir_leitura_fasta, dir_escrita_align, email_usuario):
+    """
+    Submete todos os FASTAs de uma vez, com no máximo 'config.clustalo_max_jobs'
+    jobs ativos no EBI, compartilhando um único pool de conexões HTTP.
+    Retorna {arquivo: alinhamento} só dos jobs concluídos com sucesso.
+    """
+    limite = max(1, config.clustalo_max_jobs)
+    # Cada job pode ter até 2 requisições simultâneas (alinhamento + árvore)
+    asyncio.get_running_loop().set_default_executor(
+        concurrent.futures.ThreadPoolExecutor(max_workers=limite * 2)
+    )
+    semaforo = asyncio.Semaphore(limite)
+
+    with requests.Session() as sessao:
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=limite * 2)
+        sessao.mount("http://", adaptador)
+        sessao.mount("https://", adaptador)
+
+        print(f"\nSubmetendo {len(arquivos_escolhidos)} arquivo(s) ao Clustal Omega (até {limite} jobs simultâneos)...")
+        retornos = await asyncio.gather(*[
+            _alinhar_arquivo_async(sessao, semaforo, arquivo, dir_leitura_fasta, dir_escrita_align, email_usuario)
+            for arquivo in arquivos_escolhidos
+        ], return_exceptions=True)
+
+    resultados = {}
+    for arquivo, retorno in zip(arquivos_escolhidos, retornos):
+        if isinstance(retorno, Exception):
+            print(f"[ERRO] {arquivo}: {retorno}. Arquivo pulado.")
+        else:
+            resultados[arquivo] = retorno
+    return resultados
+
+def alinhar_dominios_clustalo_online(dir_leitura_fasta, dir_escrita_align, arquivos=None, email=None, dir_escrita_consensus=None):
     """
     Lê arquivos FASTA de 'Funcao1_Filtrar' ou 'Funcao2a_Separar' e salva os
     alinhamentos e árvores filogenéticas em subpastas
     dentro de 'Funcao4_AlinhamentoMultiplo'.
+    Usa o serviço do EBI ou um binário local, conforme 'config.align_backend'.
+    No modo incremental (só local), atualiza também o consenso em 'dir_escrita_consensus'.
+    Se 'arquivos' for informado (lista vazia = todos), não pergunta nada.
     """
     try:
         fasta_files = [f for f in os.listdir(dir_leitura_fasta) if f.endswith(".fasta")]
@@ -20,32 +297,50 @@ def alinhar_dominios_clustalo_online(dir_leitura_fasta, dir_escrita_align):
             print(f"\nNenhum arquivo FASTA encontrado em '{dir_leitura_fasta}'.")
             return None
 
-        print("\nArquivos FASTA disponíveis para alinhamento:\n")
-        for i, f in enumerate(fasta_files, start=1):
-            print(f"[{i}] {f}")
+        if arquivos is not None:
+            arquivos_escolhidos = [f for f in fasta_files if not arquivos or f in arquivos]
+        else:
+            print("\nArquivos FASTA disponíveis para alinhamento:\n")
+            for i, f in enumerate(fasta_files, start=1):
+                print(f"[{i}] {f}")
 
-        selecao = input(
-            "\nDigite os números dos arquivos que deseja alinhar (ex: 1,3) ou 0 para todos: "
-        ).strip()
+            selecao = input(
+                "\nDigite os números dos arquivos que deseja alinhar (ex: 1,3) ou 0 para todos: "
+            ).strip()
 
-        if selecao == "0":
-            arquivos_escolhidos = fasta_files
-        else:
-            try:
-                indices = [int(x.strip()) for x in selecao.split(",") if x.strip().isdigit()]
-                arquivos_escolhidos = [fasta_files[i - 1] for i in indices if 1 <= i <= len(fasta_files)]
-            except Exception:
-                print("Seleção inválida.")
-                return None
+            if selecao == "0":
+                arquivos_escolhidos = fasta_files
+            else:
+                try:
+                    indices = [int(x.strip()) for x in selecao.split(",") if x.strip().isdigit()]
+                    arquivos_escolhidos = [fasta_files[i - 1] for i in indices if 1 <= i <= len(fasta_files)]
+                except Exception:
+                    print("Seleção inválida.")
+                    return None
 
         if not arquivos_escolhidos:
             print("Nenhum arquivo selecionado. Encerrando.")
             return None
 
-        email_usuario = input("Digite seu e-mail (ou 'n' para pular): ").strip()
+        if config.align_incremental and config.align_backend == "ebi":
+            print("[Aviso] O modo incremental exige align_backend 'clustalo' ou 'mafft'. Alinhando do zero.")
+
+        if config.align_backend != "ebi":
+            resultados = _alinhar_todos_local(arquivos_escolhidos, dir_leitura_fasta, dir_escrita_align, dir_escrita_consensus)
+            print(f"\n{len(resultados)}/{len(arquivos_escolhidos)} alinhamentos concluídos ({config.align_backend} local).")
+            return resultados
+
+        email_usuario = email if email is not None else input("Digite seu e-mail (ou 'n' para pular): ").strip()
         if email_usuario.lower() == 'n' or not email_usuario:
             email_usuario = "example@example.com"
 
+        if config.clustalo_async:
+            resultados = asyncio.run(_alinhar_todos_async(
+                arquivos_escolhidos, dir_leitura_fasta, dir_escrita_align, email_usuario
+            ))
+            print(f"\n{len(resultados)}/{len(arquivos_escolhidos)} alinhamentos concluídos.")
+            return resultados
+
         resultados = {}
 
         for arquivo_fasta in arquivos_escolhidos:
@@ -55,26 +350,16 @@ def alinhar_dominios_clustalo_online(dir_leitura_fasta, dir_escrita_align):
             with open(caminho_fasta, 'r') as f:
                 seq_data = f.read()
 
-            url_run = "https://www.ebi.ac.uk/Tools/services/rest/clustalo/run/"
-            params = {
-                'email': email_usuario,
-                'stype': 'protein',
-                'sequence': seq_data,
-                'outfmt': 'clustal',
-                'guidetreeout': 'true', 
-            }
-
             print("Enviando para Clustal Omega...")
-            response = requests.post(url_run, data=params)
+            response = requests.post(_url("run/"), data=_parametros_job(seq_data, email_usuario))
             response.raise_for_status()
             job_id = response.text.strip()
             print(f"Job enviado! ID: {job_id}")
 
-            url_status = f"https://www.ebi.ac.uk/Tools/services/rest/clustalo/status/{job_id}"
             status = ""
             while status not in ["FINISHED", "ERROR"]:
                 time.sleep(5)
-                status_resp = requests.get(url_status)
+                status_resp = requests.get(_url(f"status/{job_id}"))
                 status_resp.raise_for_status()
                 status = status_resp.text.strip()
                 print(f"Status do job ({arquivo_fasta}): {status}")
@@ -83,37 +368,16 @@ def alinhar_dominios_clustalo_online(dir_leitura_fasta, dir_escrita_align):
                 print("Erro no job. Pulando arquivo.")
                 continue
 
-            nome_base = os.path.splitext(arquivo_fasta)[0]
-            pasta_saida_especifica = os.path.join(dir_escrita_align, nome_base)
-            os.makedirs(pasta_saida_especifica, exist_ok=True)
-            print(f"Salvando resultados em: {pasta_saida_especifica}")
-
             # Baixar Alinhamento
-            url_result = f"https://www.ebi.ac.uk/Tools/services/rest/clustalo/result/{job_id}/aln-clustal"
-            result_resp = requests.get(url_result)
+            result_resp = requests.get(_url(f"result/{job_id}/aln-clustal"))
             result_resp.raise_for_status()
-            aln_text = result_resp.text
-
-            arquivo_alinhado = os.path.join(pasta_saida_especifica, f"{nome_base}_clustalo_alinhamento.clustal")
-            with open(arquivo_alinhado, 'w') as f:
-                f.write(aln_text)
-            print(f"Alinhamento salvo em: {arquivo_alinhado}")
-
-            alignment = AlignIO.read(StringIO(aln_text), "clustal")
-            print(f"✓ {len(alignment)} sequências alinhadas ({alignment.get_alignment_length()} posições)")
 
             # Baixar Árvore
             print("Baixando Phylogenetic Tree...")
-            url_tree = f"https://www.ebi.ac.uk/Tools/services/rest/clustalo/result/{job_id}/tree"
-            r = requests.get(url_tree)
+            r = requests.get(_url(f"result/{job_id}/tree"))
             r.raise_for_status()
-            
-            arquivo_tree = os.path.join(pasta_saida_especifica, f"{nome_base}_tree.nwk")
-            with open(arquivo_tree, 'w') as f:
-                f.write(r.text)
-            print(f"Árvore salva em: {arquivo_tree}")
-            
-            resultados[arquivo_fasta] = alignment
+
+            resultados[arquivo_fasta] = _salvar_resultados(arquivo_fasta, dir_escrita_align, result_resp.text, r.text)
 
         print("\nTodos os alinhamentos concluídos com sucesso!")
         return resultados
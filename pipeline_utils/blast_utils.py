@@ -4,20 +4,378 @@ Módulo para a Função 2: Rodar BLASTp.
 
 import os
 import subprocess
+import concurrent.futures
+import hashlib
+import sqlite3
+import tempfile
 from Bio import SeqIO
 import config
+from pipeline_utils import model_utils
+
+def _converter_seqres(caminho_seqres, caminho_saida):
+    """
+    Converte o pdb_seqres.txt do RCSB (ex: '>101m_A mol:protein length:154  MYOGLOBIN')
+    para cabeçalhos 'pdb|101M|A MYOGLOBIN', mantendo só as cadeias de proteína.
+    Esse é o mesmo formato de sseqid retornado por '-db pdb -remote'.
+    """
+    total = 0
+    manter = False
+    with open(caminho_seqres, 'r') as f_in, open(caminho_saida, 'w') as f_out:
+        for linha in f_in:
+            if linha.startswith(">"):
+                partes = linha[1:].split(None, 3)
+                manter = len(partes) >= 2 and partes[1] == "mol:protein" and "_" in partes[0]
+                if manter:
+                    codigo, cadeia = partes[0].split("_", 1)
+                    descricao = partes[3].strip() if len(partes) > 3 else ""
+                    f_out.write(f">pdb|{codigo.upper()}|{cadeia} {descricao}\n")
+                    total += 1
+            elif manter:
+                f_out.write(linha)
+    return total
+
+def preparar_banco_local():
+    """
+    Cria (ou reaproveita) o banco BLAST local a partir de 'config.blast_pdb_seqres'.
+    O banco só é reconstruído se o FASTA de origem for mais novo que ele.
+    Retorna o prefixo do banco ou None em caso de erro.
+    """
+    prefixo = config.blast_db_local
+    origem = config.blast_pdb_seqres
+
+    if not os.path.exists(origem):
+        print(f"[ERRO] FASTA do PDB para o banco local não encontrado: {origem}")
+        return None
+
+    indices = [prefixo + ext for ext in (".pin", ".pal")]
+    existentes = [i for i in indices if os.path.exists(i)]
+    if existentes and os.path.getmtime(existentes[0]) >= os.path.getmtime(origem):
+        return prefixo
+
+    print(f"Criando banco BLAST local em '{prefixo}' (makeblastdb)...")
+    os.makedirs(os.path.dirname(prefixo), exist_ok=True)
+    fasta_convertido = prefixo + "_fonte.fasta"
+    try:
+        total = _converter_seqres(origem, fasta_convertido)
+        print(f"  -> {total} cadeias de proteína convertidas.")
+        comando = [
+            "makeblastdb",
+            "-in", fasta_convertido,
+            "-dbtype", "prot",
+            "-parse_seqids",
+            "-out", prefixo,
+        ]
+        resultado = subprocess.run(comando, capture_output=True, text=True)
+        if resultado.returncode != 0:
+            print(f"[ERRO] makeblastdb falhou: {resultado.stderr.strip()}")
+            return None
+    except FileNotFoundError:
+        print("[ERRO] 'makeblastdb' não encontrado. Instale o BLAST+ ou use blast_modo = 'remoto'.")
+        return None
+    finally:
+        if os.path.exists(fasta_convertido):
+            os.remove(fasta_convertido)
+
+    print("  -> Banco local pronto.")
+    return prefixo
+
+def _montar_comando_blast(entrada, saida):
+    """
+    Monta a linha de comando do blastp conforme 'config.blast_modo'.
+    """
+    comando = ["blastp", "-query", entrada]
+    if config.blast_modo == "local":
+        comando += ["-db", config.blast_db_local, "-num_threads", str(config.blast_num_threads)]
+    else:
+        comando += ["-db", "pdb", "-remote"]
+    comando += [
+        "-evalue", config.blast_evalue,
+        "-max_target_seqs", str(config.blast_max_target_seqs), 
+        "-outfmt", "6 qseqid sseqid pident length evalue bitscore stitle",
+        "-out", saida
+    ]
+    return comando
+
+def _rodar_arquivo(job):
+    """
+    Roda um blastp para um arquivo .fasta inteiro ('job' = (nome, entrada, saida)).
+    O resultado é escrito em um arquivo temporário e só renomeado para 'saida'
+    se o blastp terminar sem erro, para que falhas não contem como "já processado".
+    """
+    nome, entrada, saida = job
+    print(f"Rodando BLASTp para {nome}...")
+    temporario = saida + ".tmp"
+    try:
+        resultado = subprocess.run(_montar_comando_blast(entrada, temporario), capture_output=True, text=True)
+        if resultado.returncode != 0:
+            raise RuntimeError(resultado.stderr.strip() or f"blastp saiu com código {resultado.returncode}")
+        os.replace(temporario, saida)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+def _rodar_lote(lote):
+    """
+    Roda um único blastp para uma lista de (chave, SeqRecord).
+    As queries recebem IDs temporários ('q0', 'q1', ...) para que o
+    resultado possa ser separado sem ambiguidade, mesmo com IDs repetidos.
+    Os arquivos do lote ficam numa pasta temporária do sistema, fora de
+    'Funcao3_Blastp' (sobras de uma execução interrompida não viram resultados).
+    Retorna a lista de linhas de hits de cada query (sem o qseqid, na ordem do lote).
+    """
+    with tempfile.TemporaryDirectory(prefix="blast_lote_") as pasta_lote:
+        entrada = os.path.join(pasta_lote, "lote.fasta")
+        saida = os.path.join(pasta_lote, "lote.tsv")
+        with open(entrada, 'w') as f:
+            for i, (_, record) in enumerate(lote):
+                f.write(f">q{i}\n{record.seq}\n")
+
+        resultado = subprocess.run(_montar_comando_blast(entrada, saida), capture_output=True, text=True)
+        if resultado.returncode != 0:
+            raise RuntimeError(resultado.stderr.strip() or f"blastp saiu com código {resultado.returncode}")
+
+        hits = [[] for _ in lote]
+        with open(saida, 'r') as f:
+            for linha in f:
+                qid, resto = linha.split('\t', 1)
+                hits[int(qid[1:])].append(resto)
+        return hits
+
+def _rodar_pool(jobs, executar, ao_concluir, ao_falhar=None):
+    """
+    Executa 'executar(job)' para cada (nome, job) em um pool de até
+    'config.blast_max_jobs_paralelos' threads (cada uma controla um blastp).
+    'ao_concluir(job, resultado)' e 'ao_falhar(job)' rodam na thread principal.
+    Falhas são isoladas por job e listadas no final. Retorna a lista de falhas.
+    """
+    max_jobs = max(1, config.blast_max_jobs_paralelos)
+    print(f"\n--- Iniciando BLASTp ({config.blast_modo}): {len(jobs)} job(s), até {max_jobs} em paralelo ---")
+
+    falhas = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_jobs) as executor:
+        future_to_job = {executor.submit(executar, job): (nome, job) for nome, job in jobs}
+
+        for future in concurrent.futures.as_completed(future_to_job):
+            nome, job = future_to_job[future]
+            try:
+                resultado = future.result()
+            except Exception as exc:
+                print(f"  -> [ERRO] {nome}: {exc}")
+                falhas.append((nome, str(exc)))
+                if ao_falhar:
+                    ao_falhar(job)
+                continue
+            ao_concluir(job, resultado)
+
+    if falhas:
+        print(f"\n[Atenção] {len(falhas)} job(s) de BLAST falharam:")
+        for nome, erro in falhas:
+            print(f"  - {nome}: {erro}")
+    return falhas
+
+def _identificador_banco():
+    """
+    Identifica o banco usado na busca, para compor a chave do cache.
+    No modo local inclui a data de criação do banco, invalidando o cache quando ele é reconstruído.
+    """
+    if config.blast_modo != "local":
+        return "pdb (remoto)"
+    for ext in (".pin", ".pal"):
+        if os.path.exists(config.blast_db_local + ext):
+            return f"{config.blast_db_local}@{os.path.getmtime(config.blast_db_local + ext)}"
+    return config.blast_db_local
+
+def _chave_query(record, banco):
+    """
+    Chave do cache: hash dos resíduos + banco + e-value + max_target_seqs.
+    """
+    residuos = str(record.seq).upper().rstrip("*")
+    texto = f"{residuos}|{banco}|{config.blast_evalue}|{config.blast_max_target_seqs}"
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+def _abrir_cache():
+    """
+    Abre (criando se preciso) o cache SQLite de resultados do BLAST.
+    """
+    os.makedirs(os.path.dirname(config.blast_cache_path), exist_ok=True)
+    conexao = sqlite3.connect(config.blast_cache_path)
+    conexao.execute("CREATE TABLE IF NOT EXISTS blast_cache (chave TEXT PRIMARY KEY, hits TEXT NOT NULL)")
+    return conexao
+
+def _executar_por_query(pendentes):
+    """
+    Executa o BLAST query a query: usado com lotes ('config.blast_tamanho_lote' > 0)
+    e/ou com o cache ('config.blast_cache'). Queries já presentes no cache (ou
+    repetidas entre arquivos) são buscadas uma única vez; cada '*_blast.tsv' é
+    gravado assim que todas as suas queries têm resultado.
+    """
+    cache = _abrir_cache() if config.blast_cache else None
+    banco = _identificador_banco()
+    try:
+        saidas = []
+        faltando = []
+        dependentes = {}
+        resultados = {}
+        a_buscar = {}
+
+        for nome, entrada, saida in pendentes:
+            records = list(SeqIO.parse(entrada, "fasta")) if isinstance(entrada, str) else entrada
+            if not records:
+                print(f"  -> {nome} não contém sequências. Pulando.")
+                continue
+
+            i_arquivo = len(saidas)
+            itens = []
+            faltando.append(0)
+            for i, record in enumerate(records):
+                chave = _chave_query(record, banco) if cache else f"{i_arquivo}:{i}"
+                itens.append((record.id, chave))
+
+                if chave not in resultados and chave not in a_buscar and cache:
+                    linha = cache.execute("SELECT hits FROM blast_cache WHERE chave = ?", (chave,)).fetchone()
+                    if linha is not None:
+                        resultados[chave] = linha[0].splitlines(keepends=True)
+                if chave not in resultados:
+                    a_buscar.setdefault(chave, (record, nome))
+                    dependentes.setdefault(chave, []).append(i_arquivo)
+                    faltando[i_arquivo] += 1
+            saidas.append((saida, itens))
+
+        def gravar(i_arquivo):
+            # Como em '_rodar_arquivo': grava num temporário e só então renomeia,
+            # para que um arquivo incompleto nunca conte como "já processado".
+            saida, itens = saidas[i_arquivo]
+            temporario = saida + ".tmp"
+            try:
+                with open(temporario, 'w') as f:
+                    for query_id, chave in itens:
+                        f.writelines(f"{query_id}\t{resto}" for resto in resultados[chave])
+                os.replace(temporario, saida)
+            finally:
+                if os.path.exists(temporario):
+                    os.remove(temporario)
+            print(f"Resultado salvo em: {saida}")
+
+        if cache:
+            print(f"Cache do BLAST: {len(resultados)} query(s) reaproveitada(s), {len(a_buscar)} a buscar.")
+        for i_arquivo, n in enumerate(faltando):
+            if n == 0:
+                gravar(i_arquivo)
+
+        if not a_buscar:
+            return []
+
+        itens = [(chave, record) for chave, (record, _) in a_buscar.items()]
+        if config.blast_tamanho_lote > 0:
+            tamanho = config.blast_tamanho_lote
+            grupos = [itens[i:i + tamanho] for i in range(0, len(itens), tamanho)]
+            nomes = [f"lote {n}/{len(grupos)} ({len(g)} sequências)" for n, g in enumerate(grupos, start=1)]
+        else:
+            por_arquivo = {}
+            for chave, record in itens:
+                por_arquivo.setdefault(a_buscar[chave][1], []).append((chave, record))
+            nomes, grupos = list(por_arquivo.keys()), list(por_arquivo.values())
+        jobs = [(nome, (nome, grupo)) for nome, grupo in zip(nomes, grupos)]
+
+        def executar(job):
+            nome, grupo = job
+            print(f"Rodando BLASTp para {nome}...")
+            return _rodar_lote(grupo)
+
+        def ao_concluir(job, hits):
+            for (chave, _), linhas in zip(job[1], hits):
+                resultados[chave] = linhas
+                if cache:
+                    cache.execute("INSERT OR REPLACE INTO blast_cache (chave, hits) VALUES (?, ?)",
+                                  (chave, "".join(linhas)))
+                for i_arquivo in dependentes.pop(chave, []):
+                    if faltando[i_arquivo] is None:
+                        continue
+                    faltando[i_arquivo] -= 1
+                    if faltando[i_arquivo] == 0:
+                        gravar(i_arquivo)
+            if cache:
+                cache.commit()
+
+        def ao_falhar(job):
+            for chave, _ in job[1]:
+                for i_arquivo in dependentes.pop(chave, []):
+                    if faltando[i_arquivo] is not None:
+                        faltando[i_arquivo] = None
+                        print(f"  -> {os.path.basename(saidas[i_arquivo][0])} não será gravado.")
+
+        return _rodar_pool(jobs, executar, ao_concluir, ao_falhar)
+    finally:
+        if cache:
+            cache.close()
+
+def _executar_blast(pendentes):
+    """
+    Executa os jobs de BLAST pendentes (lista de (nome, entrada, saida)).
+    'entrada' é um caminho .fasta ou, para sequências de um pacote, a lista de SeqRecords.
+    Sem lotes, sem cache e sem pacotes, roda um blastp por arquivo; caso contrário,
+    trabalha query a query (ver '_executar_por_query'). Retorna a lista de falhas.
+    """
+    if not pendentes:
+        print("Nenhum arquivo pendente.")
+        return []
+
+    if config.blast_modo == "local" and preparar_banco_local() is None:
+        print("Banco local indisponível. Pulando BLAST.")
+        return [(nome, "banco local indisponível") for nome, _, _ in pendentes]
+
+    if config.blast_tamanho_lote > 0 or config.blast_cache or not all(isinstance(e, str) for _, e, _ in pendentes):
+        return _executar_por_query(pendentes)
+
+    jobs = [(nome, (nome, entrada, saida)) for nome, entrada, saida in pendentes]
+    return _rodar_pool(jobs, _rodar_arquivo, lambda job, _: print(f"Resultado salvo em: {job[2]}"))
+
+def _listar_pendentes(dir_leitura_fasta, dir_escrita_blast, arquivos):
+    """
+    Retorna os (nome, entrada, saida) ainda sem resultado, pulando os já processados.
+    """
+    pendentes = []
+    for fasta in arquivos:
+        entrada = os.path.join(dir_leitura_fasta, fasta)
+        saida = os.path.join(dir_escrita_blast, f"{fasta}_blast.tsv")
+
+        if os.path.exists(saida) and os.path.getsize(saida) > 0:
+            print(f"  -> {fasta} já processado. Pulando.")
+            continue
+        pendentes.append((fasta, entrada, saida))
+    return pendentes
+
+def _listar_pendentes_pacote(caminho_pacote, dir_escrita_blast, ignorar=()):
+    """
+    Como '_listar_pendentes', para as sequências de um pacote
+    ('model_utils.PACOTE_SUFIXO'): cada sequência gera o mesmo
+    '<nome>.fasta_blast.tsv' que seu arquivo individual geraria.
+    Nomes em 'ignorar' (já presentes como arquivo) são pulados.
+    """
+    pendentes = []
+    for nome, record in model_utils.listar_pacote(caminho_pacote):
+        fasta = f"{nome}.fasta"
+        if fasta in ignorar:
+            continue
+        saida = os.path.join(dir_escrita_blast, f"{fasta}_blast.tsv")
+        if os.path.exists(saida) and os.path.getsize(saida) > 0:
+            continue
+        pendentes.append((fasta, [record], saida))
+    return pendentes
 
 def rodar_blast(dir_leitura_fasta, dir_escrita_blast, automatico=False):
     """
     Lê arquivos FASTA e roda BLASTp.
     Se automatico=True, processa todos os arquivos da pasta sem perguntar.
+    Retorna a lista de jobs que falharam ([] = tudo certo), ou None se o
+    BLAST nem pôde ser executado (sem arquivos, seleção inválida, erro inesperado).
     """
     try:
         fasta_files = [f for f in os.listdir(dir_leitura_fasta) if f.endswith('.fasta')]
         
         if not fasta_files:
             print(f"\n[Atenção] Nenhum arquivo .fasta encontrado em '{dir_leitura_fasta}'.")
-            return
+            return None
 
         # Seleção de Arquivos
         if automatico:
@@ -42,38 +400,61 @@ def rodar_blast(dir_leitura_fasta, dir_escrita_blast, automatico=False):
                     arquivos_escolhidos = [fasta_files[i - 1] for i in indices if 1 <= i <= len(fasta_files)]
                 except Exception:
                     print("Seleção inválida. Pulando BLAST.")
-                    return
+                    return None
 
         if not arquivos_escolhidos:
             print("Nenhum arquivo selecionado. Pulando BLAST.")
-            return
+            return None
 
-        print("\n--- Iniciando BLASTp ---")
-        for fasta in arquivos_escolhidos:
-            entrada = os.path.join(dir_leitura_fasta, fasta)
-            saida = os.path.join(dir_escrita_blast, f"{fasta}_blast.tsv")
+        pendentes = _listar_pendentes(dir_leitura_fasta, dir_escrita_blast, arquivos_escolhidos)
+        falhas = _executar_blast(pendentes)
 
-            if os.path.exists(saida) and os.path.getsize(saida) > 0:
-                print(f"  -> {fasta} já processado. Pulando.")
-                continue
+        print(f"\nBLAST concluído para pasta: {os.path.basename(dir_leitura_fasta)}")
+        return falhas
+        
+    except Exception as e:
+        print(f"\nErro inesperado no BLAST: {e}")
+        return None
 
-            print(f"Rodando BLASTp para {fasta}...")
+def rodar_blast_em_subpastas(dir_base, dir_escrita_blast, subpastas=None):
+    """
+    Roda o BLASTp (modo automático) em subpastas de 'Funcao2b_FastasIndividuais'
+    ou 'Funcao5_Consensus', espelhando-as dentro de 'Funcao3_Blastp'.
+    Os arquivos de todas as subpastas vão para um único pool de jobs.
+    Subpastas no formato pacote ('*.pack.sqlite') são lidas direto do pacote.
+    Se 'subpastas' for None ou vazia, processa todas.
+    Retorna a lista de jobs que falharam, ou None (como 'rodar_blast').
+    """
+    try:
+        todas = [d for d in os.listdir(dir_base) if os.path.isdir(os.path.join(dir_base, d))]
+    except Exception as e:
+        print(f"Erro ao ler {dir_base}: {e}")
+        return None
 
-            comando = [
-                "blastp",
-                "-query", entrada,
-                "-db", "pdb",
-                "-remote",
-                "-evalue", "1e-5",
-                "-max_target_seqs", str(config.blast_max_target_seqs), 
-                "-outfmt", "6 qseqid sseqid pident length evalue bitscore stitle",
-                "-out", saida
-            ]
+    pastas_proc = [d for d in todas if not subpastas or d in subpastas]
+    if not pastas_proc:
+        print("Nenhuma subpasta encontrada.")
+        return None
 
-            subprocess.run(comando)
-            print(f"Resultado salvo em: {saida}")
+    try:
+        pendentes = []
+        for p in pastas_proc:
+            s_dir = os.path.join(dir_base, p)
+            t_dir = os.path.join(dir_escrita_blast, p)
+            os.makedirs(t_dir, exist_ok=True)
+
+            fasta_files = [f for f in os.listdir(s_dir) if f.endswith('.fasta')]
+            pacotes = [f for f in os.listdir(s_dir) if f.endswith(model_utils.PACOTE_SUFIXO)]
+            print(f"-> {len(fasta_files)} arquivo(s) e {len(pacotes)} pacote(s) em '{p}'...")
+            pendentes_pasta = _listar_pendentes(s_dir, t_dir, fasta_files)
+            for pacote in pacotes:
+                pendentes_pasta += _listar_pendentes_pacote(os.path.join(s_dir, pacote), t_dir, set(fasta_files))
+            pendentes += [(os.path.join(p, nome), entrada, saida) for nome, entrada, saida in pendentes_pasta]
+
+        falhas = _executar_blast(pendentes)
+        print(f"\nBLAST concluído para {len(pastas_proc)} subpasta(s) de: {os.path.basename(dir_base)}")
+        return falhas
 
-        print(f"\nBLAST concluído para pasta: {os.path.basename(dir_leitura_fasta)}")
-        
     except Exception as e:
-        print(f"\nErro inesperado no BLAST: {e}")
\ No newline at end of file
+        print(f"\nErro inesperado no BLAST: {e}")
+        return None
@@ -3,9 +3,14 @@ Módulo para a Função 4: Gerar sequências consenso de alinhamentos.
 """
 
 from Bio import AlignIO
-from collections import Counter
+from Bio import SeqIO
+import numpy as np
 import random
 import os
+import tempfile
+import concurrent.futures
+import multiprocessing
+import config
 
 residue_classes = {
     "A": "hidrofóbico", "V": "hidrofóbico", "L": "hidrofóbico", "I": "hidrofóbico", "M": "hidrofóbico",
@@ -16,50 +21,299 @@ residue_classes = {
     "C": "especial (enxofre)", "G": "especial (flexível)", "P": "especial (cíclico)"
 }
 
-def gerar_consenso_e_relatorio(arquivo_alinhamento, formato="clustal", limite_gaps=0.7, pasta_saida="consensus_results"):
+GAP = ord("-")
+AMINOACIDOS = "ACDEFGHIKLMNPQRSTVWY"
+CLASSES = list(dict.fromkeys(residue_classes.values()))
+
+def _matriz_residuos(alinhamento):
+    """
+    Converte o alinhamento em uma matriz uint8 (sequências x posições)
+    com o código de cada caractere.
+    """
+    texto = b"".join(str(record.seq).encode("latin-1") for record in alinhamento)
+    return np.frombuffer(texto, dtype=np.uint8).reshape(len(alinhamento), -1)
+
+def _ler_matriz_em_disco(arquivo_alinhamento, formato, caminho_matriz):
+    """
+    Modo streaming: lê o alinhamento (clustal ou fasta) linha a linha e grava os
+    resíduos direto numa matriz uint8 mapeada em disco (np.memmap), sem criar
+    SeqRecords nem guardar blocos inteiros. A memória usada não depende do
+    número de sequências, nos dois formatos.
+    """
+    if formato == "fasta":
+        n_seq, comprimento, atual = 0, None, 0
+        with open(arquivo_alinhamento, "rb") as entrada, open(caminho_matriz, "wb") as saida:
+            for linha in entrada:
+                if linha.startswith(b">"):
+                    if n_seq:
+                        comprimento = atual if comprimento is None else comprimento
+                        if atual != comprimento:
+                            raise ValueError(f"Sequências de tamanhos diferentes em {arquivo_alinhamento}.")
+                    n_seq += 1
+                    atual = 0
+                elif n_seq:
+                    residuos = linha.strip().replace(b" ", b"")
+                    saida.write(residuos)
+                    atual += len(residuos)
+        comprimento = atual if comprimento is None else comprimento
+        if not n_seq or atual != comprimento:
+            raise ValueError(f"Alinhamento vazio ou com sequências de tamanhos diferentes: {arquivo_alinhamento}")
+        return np.memmap(caminho_matriz, dtype=np.uint8, mode="r", shape=(n_seq, comprimento))
+
+    def trechos():
+        # Gera o trecho de sequência de cada linha do clustal e None ao fim de cada bloco.
+        with open(arquivo_alinhamento, "rb") as entrada:
+            next(entrada, None)  # cabeçalho "CLUSTAL ..."
+            for linha in entrada:
+                if linha[:1].isspace() or not linha.strip():
+                    yield None
+                else:
+                    yield linha.split()[1]
+        yield None
+
+    # 1ª passada: só conta sequências e colunas.
+    n_seq, comprimento, linhas_no_bloco = 0, 0, 0
+    for trecho in trechos():
+        if trecho is None:
+            if linhas_no_bloco:
+                n_seq = n_seq or linhas_no_bloco
+                if linhas_no_bloco != n_seq:
+                    raise ValueError(f"Bloco com número de sequências diferente em {arquivo_alinhamento}.")
+            linhas_no_bloco = 0
+            continue
+        if not linhas_no_bloco:
+            comprimento += len(trecho)
+        linhas_no_bloco += 1
+    if not n_seq:
+        raise ValueError(f"Alinhamento vazio: {arquivo_alinhamento}")
+
+    # 2ª passada: cada linha vai direto para a sua posição na matriz em disco.
+    matriz = np.memmap(caminho_matriz, dtype=np.uint8, mode="w+", shape=(n_seq, comprimento))
+    inicio, largura, linha_atual = 0, 0, 0
+    for trecho in trechos():
+        if trecho is None:
+            if linha_atual:
+                inicio += largura
+            linha_atual = 0
+            continue
+        if not linha_atual:
+            largura = len(trecho)
+        elif len(trecho) != largura:
+            raise ValueError(f"Sequências de tamanhos diferentes em {arquivo_alinhamento}.")
+        matriz[linha_atual, inicio:inicio + largura] = np.frombuffer(trecho, dtype=np.uint8)
+        linha_atual += 1
+    matriz.flush()
+    del matriz
+    return np.memmap(caminho_matriz, dtype=np.uint8, mode="r", shape=(n_seq, comprimento))
+
+def _contar_simbolos(matriz, colunas_por_vez=256, linhas_por_vez=None, pesos=None):
+    """
+    Conta cada símbolo em cada coluna de 'matriz' com um único np.bincount
+    por grupo de colunas. As linhas são lidas em blocos de 'linhas_por_vez'
+    (None = todas), o que limita a memória quando 'matriz' é um np.memmap.
+    Com 'pesos' (um valor por sequência), as contagens são ponderadas.
+    Retorna (simbolos presentes, contagens[simbolo, coluna]).
+    """
+    n_linhas, n_colunas = matriz.shape
+    passo = linhas_por_vez or max(n_linhas, 1)
+    contagens = np.zeros((256, n_colunas), dtype=np.int64 if pesos is None else np.float64)
+    for linha_inicio in range(0, n_linhas, passo):
+        linhas = np.asarray(matriz[linha_inicio:linha_inicio + passo])
+        for inicio in range(0, n_colunas, colunas_por_vez):
+            parte = linhas[:, inicio:inicio + colunas_por_vez]
+            largura = parte.shape[1]
+            indices = (parte.astype(np.int32) + np.arange(largura, dtype=np.int32) * 256).ravel()
+            pesos_celulas = None if pesos is None else np.repeat(pesos[linha_inicio:linha_inicio + passo], largura)
+            contagens[:, inicio:inicio + largura] += np.bincount(
+                indices, weights=pesos_celulas, minlength=256 * largura
+            ).reshape(largura, 256).T
+    simbolos = np.flatnonzero(contagens.any(axis=1))
+    return simbolos, contagens[simbolos]
+
+def _pesos_henikoff(matriz, contagem, colunas_por_vez=256, linhas_por_vez=None):
+    """
+    Pesos de Henikoff & Henikoff (1994) para todas as sequências de uma vez:
+    em cada coluna, um resíduo contribui 1 / (r * n), onde r é o número de
+    resíduos distintos da coluna e n quantas sequências têm aquele resíduo.
+    Gaps não contribuem. Os pesos são normalizados para somar o número de
+    sequências, de modo que as contagens ponderadas ficam na mesma escala.
+    """
+    n_linhas, n_colunas = matriz.shape
+    simbolos, contagens = contagem
+    residuos = contagens[simbolos != GAP]
+    distintos = (residuos > 0).sum(axis=0)
+
+    # Tabela código -> contribuição de cada célula (0 para gaps e símbolos ausentes).
+    contribuicao = np.zeros((256, n_colunas))
+    with np.errstate(divide="ignore"):
+        contribuicao[simbolos] = np.where(contagens > 0, 1 / (distintos * contagens), 0)
+    contribuicao[GAP] = 0
+
+    passo = linhas_por_vez or max(n_linhas, 1)
+    pesos = np.zeros(n_linhas)
+    for linha_inicio in range(0, n_linhas, passo):
+        linhas = np.asarray(matriz[linha_inicio:linha_inicio + passo])
+        for inicio in range(0, n_colunas, colunas_por_vez):
+            parte = linhas[:, inicio:inicio + colunas_por_vez]
+            colunas = np.arange(inicio, inicio + parte.shape[1])
+            pesos[linha_inicio:linha_inicio + len(linhas)] += contribuicao[parte, colunas].sum(axis=1)
+
+    soma = pesos.sum()
+    if soma == 0:
+        return np.ones(n_linhas)
+    return pesos * (n_linhas / soma)
+
+def _ordem_empate(matriz, col, empatados, linhas_por_vez=None):
+    """
+    Devolve os resíduos 'empatados' na ordem em que aparecem pela primeira
+    vez na coluna 'col', lendo as linhas em blocos até encontrar todos.
+    """
+    passo = linhas_por_vez or max(matriz.shape[0], 1)
+    restantes = set(empatados)
+    primeiras = {}
+    for linha_inicio in range(0, matriz.shape[0], passo):
+        coluna = np.asarray(matriz[linha_inicio:linha_inicio + passo, col])
+        for simbolo in list(restantes):
+            posicoes = np.flatnonzero(coluna == simbolo)
+            if posicoes.size:
+                primeiras[simbolo] = linha_inicio + posicoes[0]
+                restantes.discard(simbolo)
+        if not restantes:
+            break
+    return [chr(s) for s in sorted(primeiras, key=primeiras.get)]
+
+def _consenso_bloco(bloco, limite_gaps=0.7, rng=random, linhas_por_vez=None, contagem=None):
+    """
+    Calcula, de uma vez para todas as colunas de 'bloco' (matriz uint8 ou
+    np.memmap), o resíduo consenso, sua frequência (%) e o alerta de cada posição.
+    Empates são sorteados com 'rng.choice' entre os resíduos empatados
+    na ordem em que aparecem na coluna.
+    'contagem' permite reaproveitar o resultado de '_contar_simbolos'.
+    """
+    total = bloco.shape[0]
+    simbolos, contagens = contagem if contagem is not None else _contar_simbolos(bloco, linhas_por_vez=linhas_por_vez)
+
+    eh_gap = simbolos == GAP
+    sem_gaps = np.where(eh_gap[:, None], 0, contagens)
+    gaps = contagens[eh_gap].sum(axis=0)
+
+    max_freq = sem_gaps.max(axis=0)
+    # Com contagens ponderadas (float), empates são comparados com tolerância.
+    no_topo = np.isclose(sem_gaps, max_freq, rtol=1e-9, atol=0)
+    n_top = no_topo.sum(axis=0)
+    aa_top = simbolos[sem_gaps.argmax(axis=0)]
+    freq_consenso = (max_freq / total) * 100
+    freq_gaps = gaps / total
+
+    consenso, frequencias, alertas = [], [], []
+    for col in range(bloco.shape[1]):
+        if max_freq[col] == 0:
+            consenso.append("-")
+            frequencias.append(0)
+            alertas.append("Posição totalmente com gaps")
+            continue
+
+        freq = freq_consenso[col]
+        if n_top[col] > 1:
+            empatados = simbolos[no_topo[:, col]]
+            top_residuos = _ordem_empate(bloco, col, empatados, linhas_por_vez)
+            aa_consenso = rng.choice(top_residuos)
+            alerta = f"Empate entre {', '.join(top_residuos)}"
+        else:
+            aa_consenso = chr(aa_top[col])
+            if freq < 50:
+                alerta = f"{aa_consenso} presente em apenas {freq:.1f}% das sequências"
+            elif freq_gaps[col] > limite_gaps:
+                alerta = f"Região com {freq_gaps[col]*100:.1f}% de gaps"
+            else:
+                alerta = ""
+
+        consenso.append(aa_consenso)
+        frequencias.append(freq)
+        alertas.append(alerta)
+
+    return consenso, frequencias, alertas
+
+def _calcular_perfil(simbolos, contagens, total):
+    """
+    Monta o perfil da família a partir das contagens por coluna, sem nova
+    passada pelo alinhamento: frequências dos 20 aminoácidos (entre os
+    resíduos não-gap), PSSM em log2 contra fundo uniforme, entropia de
+    Shannon (bits), fração de gaps e frequência de cada classe de resíduo.
+    """
+    n_colunas = contagens.shape[1]
+    por_codigo = np.zeros((256, n_colunas), dtype=np.float64)
+    por_codigo[simbolos] = contagens
+
+    codigos_aa = np.frombuffer(AMINOACIDOS.encode(), dtype=np.uint8)
+    contagens_aa = por_codigo[codigos_aa].T
+    n_residuos = contagens_aa.sum(axis=1, keepdims=True)
+    frequencias = np.divide(contagens_aa, n_residuos, out=np.zeros_like(contagens_aa), where=n_residuos > 0)
+
+    fundo = 1 / len(AMINOACIDOS)
+    pssm = np.log2(((contagens_aa + fundo) / (n_residuos + 1)) / fundo)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        entropia = -np.where(frequencias > 0, frequencias * np.log2(frequencias), 0).sum(axis=1)
+
+    pertence = np.zeros((len(AMINOACIDOS), len(CLASSES)))
+    pertence[np.arange(len(AMINOACIDOS)), [CLASSES.index(residue_classes[aa]) for aa in AMINOACIDOS]] = 1
+    classes = frequencias @ pertence
+
+    return {
+        "aminoacidos": np.array(list(AMINOACIDOS)),
+        "frequencias": frequencias.astype(np.float32),
+        "pssm": pssm.astype(np.float32),
+        "entropia": entropia.astype(np.float32),
+        "fracao_gaps": (por_codigo[GAP] / total).astype(np.float32),
+        "classes": np.array(CLASSES),
+        "frequencias_classes": classes.astype(np.float32),
+    }
+
+def carregar_perfil(caminho_perfil):
+    """
+    Lê um '<familia>_profile.npz' e devolve um dicionário com os arrays.
+    A posição i do consenso corresponde à linha i de cada matriz.
+    """
+    with np.load(caminho_perfil) as dados:
+        return {chave: dados[chave] for chave in dados.files}
+
+def gerar_consenso_e_relatorio(arquivo_alinhamento, formato="clustal", limite_gaps=0.7, pasta_saida="consensus_results", semente=None):
     """
     Processa um único arquivo de alinhamento e salva seu consenso
     e relatório na 'pasta_saida' especificada.
+    Com 'semente', os sorteios de empate são reproduzíveis entre execuções.
+    Com 'config.consenso_streaming', o alinhamento vai para uma matriz em
+    disco e é lido em blocos de linhas (mesmo resultado, memória limitada).
+    Com 'config.consenso_ponderado', cada sequência conta com seu peso de
+    Henikoff, reduzindo o viés de famílias dominadas por parálogos quase idênticos.
     """
-    alinhamento = AlignIO.read(arquivo_alinhamento, formato)
-    n_seq = len(alinhamento)
-    tamanho = alinhamento.get_alignment_length()
-    
     nome_base = os.path.splitext(os.path.basename(arquivo_alinhamento))[0]
-    
-    consenso = []
-    relatorio = []
+    rng = random.Random(semente) if semente is not None else random
 
-    for pos in range(tamanho):
-        coluna = [seq[pos] for seq in alinhamento]
-        contagem = Counter(coluna)
-        total = sum(contagem.values())
-        
-        sem_gaps = {aa: freq for aa, freq in contagem.items() if aa != "-"}
-        gaps = contagem.get("-", 0)
-        freq_gaps = gaps / total
-        
-        alerta = ""
-        if not sem_gaps:
-            consenso.append("-")
-            alerta = "Posição totalmente com gaps"
-            freq_consenso = 0
-            aa_consenso = "-"
-        else:
-            max_freq = max(sem_gaps.values())
-            top_residuos = [aa for aa, f in sem_gaps.items() if f == max_freq]
-            aa_consenso = random.choice(top_residuos) if len(top_residuos) > 1 else top_residuos[0]
-            freq_consenso = (max_freq / total) * 100
-            
-            if len(top_residuos) > 1:
-                alerta = f"Empate entre {', '.join(top_residuos)}"
-            elif freq_consenso < 50:
-                alerta = f"{aa_consenso} presente em apenas {freq_consenso:.1f}% das sequências"
-            elif freq_gaps > limite_gaps:
-                alerta = f"Região com {freq_gaps*100:.1f}% de gaps"
-        
-            consenso.append(aa_consenso)
-        
+    if config.consenso_streaming:
+        with tempfile.TemporaryDirectory(dir=config.consenso_dir_temporario) as dir_tmp:
+            matriz = _ler_matriz_em_disco(arquivo_alinhamento, formato, os.path.join(dir_tmp, "matriz.u8"))
+            n_seq = matriz.shape[0]
+            contagem = _contar_simbolos(matriz, linhas_por_vez=config.consenso_linhas_por_bloco)
+            if config.consenso_ponderado:
+                pesos = _pesos_henikoff(matriz, contagem, linhas_por_vez=config.consenso_linhas_por_bloco)
+                contagem = _contar_simbolos(matriz, linhas_por_vez=config.consenso_linhas_por_bloco, pesos=pesos)
+            consenso, frequencias, alertas = _consenso_bloco(
+                matriz, limite_gaps, rng, linhas_por_vez=config.consenso_linhas_por_bloco, contagem=contagem
+            )
+            del matriz
+    else:
+        alinhamento = AlignIO.read(arquivo_alinhamento, formato)
+        matriz = _matriz_residuos(alinhamento)
+        n_seq = matriz.shape[0]
+        contagem = _contar_simbolos(matriz)
+        if config.consenso_ponderado:
+            contagem = _contar_simbolos(matriz, pesos=_pesos_henikoff(matriz, contagem))
+        consenso, frequencias, alertas = _consenso_bloco(matriz, limite_gaps, rng, contagem=contagem)
+
+    relatorio = []
+    for pos, (aa_consenso, freq_consenso, alerta) in enumerate(zip(consenso, frequencias, alertas)):
         classe = residue_classes.get(aa_consenso, "desconhecida")
         relatorio.append([
             pos + 1, aa_consenso, f"{freq_consenso:.1f}", n_seq, classe, alerta
@@ -71,6 +325,7 @@ def gerar_consenso_e_relatorio(arquivo_alinhamento, formato="clustal", limite_ga
     
     fasta_saida = os.path.join(pasta_saida, f"{nome_base}_consensus.fasta")
     relatorio_saida = os.path.join(pasta_saida, f"{nome_base}_report.tsv")
+    perfil_saida = os.path.join(pasta_saida, f"{nome_base}_profile.npz")
     
     with open(fasta_saida, "w") as f:
         f.write(f">{nome_base}_consensus\n")
@@ -81,16 +336,58 @@ def gerar_consenso_e_relatorio(arquivo_alinhamento, formato="clustal", limite_ga
         f.write("Posição\tResíduo_Consenso\tFrequência_Consenso(%)\tNº_Sequências\tClasse_Residuo\tAlerta\n")
         for linha in relatorio:
             f.write("\t".join(map(str, linha)) + "\n")
+
+    np.savez_compressed(perfil_saida, **_calcular_perfil(*contagem, n_seq))
     
     print(f"  -> Salvo em: {pasta_saida}")
     
     return f"{nome_base}_consensus", consenso_seq
 
+def atualizar_fasta_geral(dir_escrita_consensus, nome_base, consenso_seq):
+    """
+    Substitui (ou acrescenta) uma única entrada no 'todas_consensus.fasta',
+    mantendo a ordem das demais.
+    """
+    fasta_geral = os.path.join(dir_escrita_consensus, "todas_consensus.fasta")
+    entradas = []
+    if os.path.exists(fasta_geral):
+        entradas = [(r.id, str(r.seq)) for r in SeqIO.parse(fasta_geral, "fasta")]
+
+    cabecalho = f"{nome_base}_consensus"
+    if any(nome == cabecalho for nome, _ in entradas):
+        entradas = [(nome, consenso_seq if nome == cabecalho else seq) for nome, seq in entradas]
+    else:
+        entradas.append((cabecalho, consenso_seq))
+
+    with open(fasta_geral, "w") as f:
+        for nome, seq in entradas:
+            f.write(f">{nome}\n")
+            for i in range(0, len(seq), 60):
+                f.write(seq[i:i+60] + "\n")
+
+def _processar_alinhamento(caminho_completo, limite_gaps, pasta_saida_especifica, semente):
+    """
+    Tarefa executada em um processo do pool: gera consenso e relatório de um alinhamento.
+    """
+    os.makedirs(pasta_saida_especifica, exist_ok=True) 
+    formato = "clustal" if caminho_completo.endswith((".clustal", ".aln")) else "fasta"
+    return gerar_consenso_e_relatorio(
+        caminho_completo, 
+        formato=formato, 
+        limite_gaps=limite_gaps, 
+        pasta_saida=pasta_saida_especifica,
+        semente=semente
+    )
+
 def gerar_consensos_para_diretorio(dir_leitura_align, dir_escrita_consensus, limite_gaps=0.7):
     """
     Busca (recursivamente) por arquivos de alinhamento em 'Funcao4_AlinhamentoMultiplo',
     gera consenso e salva os resultados em subpastas espelhadas
     dentro de 'Funcao5_Consensus'.
+    Os arquivos são distribuídos em até 'config.consenso_max_processos' processos;
+    a ordem dos resultados (e do 'todas_consensus.fasta') não depende disso.
+    Retorna a lista de (arquivo, erro) dos alinhamentos que falharam, ou None
+    se nenhum alinhamento foi encontrado.
     """
     pasta_saida_raiz = dir_escrita_consensus 
     arquivos_a_processar = [] 
@@ -98,6 +395,7 @@ def gerar_consensos_para_diretorio(dir_leitura_align, dir_escrita_consensus, lim
     print(f"Buscando arquivos de alinhamento em: {dir_leitura_align}...")
     
     for root, dirs, files in os.walk(dir_leitura_align):
+        dirs.sort()
         
         rel_path = os.path.relpath(root, dir_leitura_align)
         
@@ -106,7 +404,7 @@ def gerar_consensos_para_diretorio(dir_leitura_align, dir_escrita_consensus, lim
         else:
             pasta_saida_especifica = os.path.join(pasta_saida_raiz, rel_path)
 
-        for file in files:
+        for file in sorted(files):
             if file.endswith((".clustal", ".aln", ".fasta")):
                 caminho_completo_input = os.path.join(root, file)
                 arquivos_a_processar.append((caminho_completo_input, pasta_saida_especifica))
@@ -114,30 +412,50 @@ def gerar_consensos_para_diretorio(dir_leitura_align, dir_escrita_consensus, lim
     if not arquivos_a_processar:
         print(f"Nenhum arquivo de alinhamento (.clustal, .aln, .fasta) encontrado em '{dir_leitura_align}' ou suas subpastas.")
         print("Execute a Função 3 primeiro.")
-        return
+        return None
 
     print(f"Encontrados {len(arquivos_a_processar)} arquivos de alinhamento para processar...\n")
 
     todas_consensos = [] 
 
-    for caminho_completo, pasta_saida_especifica in arquivos_a_processar:
-        
-        os.makedirs(pasta_saida_especifica, exist_ok=True) 
-        
-        arquivo_base = os.path.basename(caminho_completo)
-        formato = "clustal" if arquivo_base.endswith((".clustal", ".aln")) else "fasta"
-        
-        print(f"Processando: {arquivo_base}")
-        try:
-            nome_base, consenso_seq = gerar_consenso_e_relatorio(
-                caminho_completo, 
-                formato=formato, 
-                limite_gaps=limite_gaps, 
-                pasta_saida=pasta_saida_especifica 
-            )
-            todas_consensos.append((nome_base, consenso_seq))
-        except Exception as e:
-            print(f"Erro ao processar {arquivo_base}: {e}")
+    # Cada arquivo usa o caminho relativo como semente dos empates, para que
+    # o resultado seja o mesmo com 1 ou N processos e entre execuções.
+    tarefas = [
+        (caminho_completo, limite_gaps, pasta_saida_especifica, os.path.relpath(caminho_completo, dir_leitura_align))
+        for caminho_completo, pasta_saida_especifica in arquivos_a_processar
+    ]
+
+    max_processos = max(1, config.consenso_max_processos)
+    if max_processos == 1:
+        resultados = []
+        for tarefa in tarefas:
+            print(f"Processando: {os.path.basename(tarefa[0])}")
+            try:
+                resultados.append(_processar_alinhamento(*tarefa))
+            except Exception as e:
+                resultados.append(e)
+    else:
+        print(f"Processando com até {max_processos} processos...")
+        # 'spawn': no modo headless esta função roda dentro de uma thread, e
+        # fazer fork de um processo com várias threads pode travar os filhos.
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_processos, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = [executor.submit(_processar_alinhamento, *tarefa) for tarefa in tarefas]
+            resultados = []
+            for future in futures:
+                try:
+                    resultados.append(future.result())
+                except Exception as e:
+                    resultados.append(e)
+
+    falhas = []
+    for tarefa, resultado in zip(tarefas, resultados):
+        if isinstance(resultado, Exception):
+            print(f"Erro ao processar {os.path.basename(tarefa[0])}: {resultado}")
+            falhas.append((tarefa[3], str(resultado)))
+        else:
+            todas_consensos.append(resultado)
 
     if todas_consensos:
         fasta_geral = os.path.join(pasta_saida_raiz, "todas_consensus.fasta")
@@ -149,4 +467,5 @@ def gerar_consensos_para_diretorio(dir_leitura_align, dir_escrita_consensus, lim
         print(f"\n Arquivo geral criado: {fasta_geral}")
 
     print("\nProcessamento de consenso concluído!")
-    print(f"Resultados individuais salvos em subpastas de: {pasta_saida_raiz}\n")
\ No newline at end of file
+    print(f"Resultados individuais salvos em subpastas de: {pasta_saida_raiz}\n")
+    return falhas
\ No newline at end of file
@@ -0,0 +1,265 @@
+"""
+Módulo para execução não interativa (headless) das Funções 1-7.
+Cada etapa declara as pastas que lê e as que escreve; as dependências
+são deduzidas dessas pastas e ramos independentes rodam em paralelo.
+"""
+
+import os
+import json
+import concurrent.futures
+import config
+
+from pipeline_utils import filter_utils
+from pipeline_utils import extract_utils
+from pipeline_utils import blast_utils
+from pipeline_utils import align_utils
+from pipeline_utils import model_utils
+from pipeline_utils import consensus_utils
+from pipeline_utils import pdb_utils
+from pipeline_utils import modeller_utils
+
+# Etapas existentes (Funções 1-7).
+ETAPAS_VALIDAS = range(1, 8)
+
+# Etapas que nunca rodam junto com outras: o MODELLER muda o diretório de
+# trabalho e redireciona stdout/stderr do processo inteiro.
+ETAPAS_EXCLUSIVAS = {7}
+
+# Parâmetros que substituem as perguntas dos menus do main.py.
+# Listas vazias significam "todos" (equivalente à opção 0 dos menus).
+PARAMETROS_PADRAO = {
+    "etapas": [1, 2, 3, 4, 5, 6, 7],
+    "input_tsv": None,
+    "input_fasta": None,
+    "metodo": None,
+    "outputs": [],
+    "selecoes": [],
+    "fonte_fastas_individuais": "Funcao2a",
+    "fonte_blast": "Funcao2b",
+    "subpastas_blast": [],
+    "fonte_alinhamento": "Funcao2a",
+    "arquivos_alinhamento": [],
+    "email": "example@example.com",
+    "limite_gaps": 0.7,
+    "pastas_pdb": [],
+    "queries": [],
+    "modo_molde": "1",
+    "max_etapas_paralelas": config.pipeline_max_etapas_paralelas,
+}
+
+def carregar_parametros(caminho_config=None, sobrescritas=None):
+    """
+    Lê os parâmetros de um arquivo JSON (opcional) e aplica as
+    sobrescritas vindas da linha de comando por cima dos padrões.
+    """
+    parametros = dict(PARAMETROS_PADRAO)
+
+    if caminho_config:
+        with open(caminho_config, 'r') as f:
+            dados = json.load(f)
+        desconhecidos = set(dados) - set(PARAMETROS_PADRAO)
+        if desconhecidos:
+            raise ValueError(f"Parâmetros desconhecidos no arquivo de configuração: {', '.join(sorted(desconhecidos))}")
+        parametros.update(dados)
+
+    for chave, valor in (sobrescritas or {}).items():
+        if valor is not None:
+            parametros[chave] = valor
+
+    try:
+        parametros["etapas"] = sorted({int(e) for e in parametros["etapas"]})
+    except (TypeError, ValueError):
+        raise ValueError(f"Etapas inválidas: {parametros['etapas']}. Use números de 1 a 7, ex: 1,2,3.")
+    desconhecidas = [e for e in parametros["etapas"] if e not in ETAPAS_VALIDAS]
+    if desconhecidas or not parametros["etapas"]:
+        raise ValueError(f"Etapas inválidas: {desconhecidas or 'nenhuma'}. Use números de 1 a 7, ex: 1,2,3.")
+    parametros["modo_molde"] = str(parametros["modo_molde"])
+    if 7 in parametros["etapas"] and parametros["modo_molde"] != "1":
+        raise ValueError(
+            f"modo_molde '{parametros['modo_molde']}' não é suportado no modo headless: "
+            "a escolha manual do molde ('2') pede a resposta pelo teclado. Use '1' (automático)."
+        )
+    for chave in ("input_tsv", "input_fasta"):
+        if parametros[chave]:
+            parametros[chave] = os.path.abspath(parametros[chave])
+    return parametros
+
+def _detectar_input(diretorio, extensoes):
+    """Versão não interativa de 'encontrar_arquivo_input': exige um único arquivo."""
+    if not os.path.exists(diretorio):
+        return None
+    arquivos = sorted(f for f in os.listdir(diretorio) if f.lower().endswith(extensoes))
+    if len(arquivos) > 1:
+        raise ValueError(f"Múltiplos arquivos {extensoes} em '{diretorio}'. Informe qual usar na configuração.")
+    return os.path.join(diretorio, arquivos[0]) if arquivos else None
+
+def _verificar_falhas(nome_etapa, falhas):
+    """
+    As funções das etapas tratam os próprios erros e só os imprimem; aqui o
+    retorno delas vira exceção, para que o executor marque a etapa como 'erro'
+    (e cancele as dependentes). None = nada foi executado; lista = falhas parciais.
+    """
+    if falhas is None:
+        raise RuntimeError(f"{nome_etapa} não foi executado (veja as mensagens acima).")
+    if falhas:
+        item, erro = falhas[0]
+        raise RuntimeError(f"{nome_etapa}: {len(falhas)} falha(s), ex.: {item}: {erro}")
+
+def _etapa_1(p, dirs):
+    input_tsv = p["input_tsv"] or _detectar_input(dirs["input"], (".tsv",))
+    input_fasta = p["input_fasta"] or _detectar_input(dirs["input"], (".fasta", ".fa", ".fna"))
+    if not input_tsv or not input_fasta:
+        raise FileNotFoundError("Arquivos .tsv/.fasta de entrada não encontrados.")
+    if p["selecoes"]:
+        # Modo em lote: várias seleções (método, outputs) com uma leitura de cada arquivo.
+        resultados = filter_utils.filtrar_selecoes_em_lote(input_tsv, input_fasta, dirs["Funcao1"], p["selecoes"])
+        if not resultados:
+            raise RuntimeError("Filtragem em lote não produziu resultados.")
+        if not extract_utils.extrair_outputs_em_lote(resultados, dirs["Funcao1"], dirs["Funcao2a"], input_fasta):
+            raise RuntimeError("Extração dos domínios (lote) falhou.")
+        return
+    if not p["metodo"] or not p["outputs"]:
+        raise ValueError("A Função 1 exige 'metodo' e 'outputs' (ou 'selecoes') no modo headless.")
+
+    df_filtrado, dominios_escolhidos, metodo_usado = filter_utils.filtrar_por_dominios_e_metodo(
+        input_tsv, input_fasta, dirs["Funcao1"], metodo=p["metodo"], outputs=p["outputs"]
+    )
+    if df_filtrado is None:
+        raise RuntimeError("Filtragem falhou.")
+    if not extract_utils.extrair_outputs_fasta(
+        df_filtrado, dominios_escolhidos, metodo_usado, dirs["Funcao1"], dirs["Funcao2a"],
+        caminho_fasta_origem=input_fasta
+    ):
+        raise RuntimeError("Extração dos domínios falhou.")
+
+def _etapa_2(p, dirs):
+    if not model_utils.enviar_para_modelagem(dirs[p["fonte_fastas_individuais"]], dirs["Funcao2b"]):
+        raise RuntimeError("Nenhum FASTA individual foi gerado.")
+
+def _etapa_3(p, dirs):
+    fonte = p["fonte_blast"]
+    if fonte in ("Funcao2b", "Funcao5"):
+        falhas = blast_utils.rodar_blast_em_subpastas(dirs[fonte], dirs["Funcao3"], p["subpastas_blast"])
+    else:
+        falhas = blast_utils.rodar_blast(dirs[fonte], dirs["Funcao3"], automatico=True)
+    _verificar_falhas("BLASTp", falhas)
+
+def _etapa_4(p, dirs):
+    dir_fonte = dirs[p["fonte_alinhamento"]]
+    resultados = align_utils.alinhar_dominios_clustalo_online(
+        dir_fonte, dirs["Funcao4"], arquivos=p["arquivos_alinhamento"], email=p["email"],
+        dir_escrita_consensus=dirs["Funcao5"])
+    if resultados is None:
+        raise RuntimeError("Alinhamento não foi executado (veja as mensagens acima).")
+    esperados = [f for f in os.listdir(dir_fonte)
+                 if f.endswith(".fasta") and (not p["arquivos_alinhamento"] or f in p["arquivos_alinhamento"])]
+    faltando = sorted(set(esperados) - set(resultados))
+    if faltando:
+        raise RuntimeError(f"Alinhamento: {len(faltando)} arquivo(s) falharam, ex.: {faltando[0]}")
+
+def definir_etapas(p, dirs):
+    """
+    Retorna o dicionário de etapas: número -> (nome, pastas lidas, pastas escritas, função).
+    As pastas lidas dependem das fontes escolhidas nos parâmetros.
+    """
+    return {
+        1: ("Filtrar e Extrair", ["input"], ["Funcao1", "Funcao2a"],
+            lambda: _etapa_1(p, dirs)),
+        2: ("Preparar FASTAs Individuais", [p["fonte_fastas_individuais"]], ["Funcao2b"],
+            lambda: _etapa_2(p, dirs)),
+        3: ("BLASTp", [p["fonte_blast"]], ["Funcao3"],
+            lambda: _etapa_3(p, dirs)),
+        4: ("Alinhamento", [p["fonte_alinhamento"]],
+            ["Funcao4", "Funcao5"] if config.align_incremental else ["Funcao4"],
+            lambda: _etapa_4(p, dirs)),
+        5: ("Consenso", ["Funcao4"], ["Funcao5"],
+            lambda: _verificar_falhas("Consenso", consensus_utils.gerar_consensos_para_diretorio(
+                dirs["Funcao4"], dirs["Funcao5"], limite_gaps=p["limite_gaps"]))),
+        6: ("Extrair e Baixar PDBs", ["Funcao3"], ["Funcao6"],
+            lambda: _verificar_falhas("Extração/download de PDBs", pdb_utils.extrair_pdb_codes(dirs["Funcao3"], dirs["Funcao6"]))),
+        7: ("MODELLER", ["Funcao2a", "Funcao2b", "Funcao5", "Funcao6"], ["Funcao7"],
+            lambda: _verificar_falhas("MODELLER", modeller_utils.run_modelling(
+                dirs["Funcao2a"], dirs["Funcao2b"], dirs["Funcao5"], dirs["Funcao6"], dirs["Funcao7"],
+                pastas=p["pastas_pdb"], queries=p["queries"], modo_molde=p["modo_molde"]))),
+    }
+
+def montar_grafo(etapas, selecionadas):
+    """
+    Calcula as dependências entre as etapas selecionadas: B depende de A
+    se B lê alguma pasta que A escreve. Levanta ValueError se houver ciclo.
+    """
+    dependencias = {}
+    for b in selecionadas:
+        entradas_b = set(etapas[b][1])
+        dependencias[b] = {a for a in selecionadas if a != b and entradas_b & set(etapas[a][2])}
+
+    # Verificação de ciclo (Kahn)
+    pendentes = {e: set(d) for e, d in dependencias.items()}
+    while pendentes:
+        prontas = [e for e, d in pendentes.items() if not d]
+        if not prontas:
+            raise ValueError(f"Ciclo de dependências entre as etapas {sorted(pendentes)}.")
+        for e in prontas:
+            del pendentes[e]
+        for d in pendentes.values():
+            d.difference_update(prontas)
+
+    return dependencias
+
+def executar_pipeline(dirs, parametros):
+    """
+    Executa as etapas selecionadas respeitando as dependências e rodando
+    até 'max_etapas_paralelas' etapas independentes ao mesmo tempo (as de
+    'ETAPAS_EXCLUSIVAS' sempre rodam sozinhas).
+    Retorna o dicionário etapa -> status ('ok', 'erro' ou 'cancelada').
+    """
+    for chave in ("fonte_fastas_individuais", "fonte_blast", "fonte_alinhamento"):
+        if parametros[chave] not in dirs:
+            raise ValueError(f"Pasta desconhecida em '{chave}': {parametros[chave]}")
+
+    etapas = definir_etapas(parametros, dirs)
+    selecionadas = [e for e in parametros["etapas"] if e in etapas]
+    dependencias = montar_grafo(etapas, selecionadas)
+
+    print("\n--- Pipeline headless ---")
+    for e in selecionadas:
+        deps = ", ".join(str(d) for d in sorted(dependencias[e])) or "-"
+        exclusiva = " | exclusiva" if e in ETAPAS_EXCLUSIVAS else ""
+        print(f"  Função {e} ({etapas[e][0]}) | depende de: {deps}{exclusiva}")
+
+    status = {}
+    em_execucao = {}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, int(parametros["max_etapas_paralelas"]))) as executor:
+        while len(status) < len(selecionadas):
+            for e in selecionadas:
+                if e in status or e in em_execucao.values():
+                    continue
+                if any(status.get(d) in ("erro", "cancelada") for d in dependencias[e]):
+                    status[e] = "cancelada"
+                    print(f"\n[Headless] Função {e} cancelada (dependência falhou).")
+                elif all(status.get(d) == "ok" for d in dependencias[e]):
+                    if em_execucao and (e in ETAPAS_EXCLUSIVAS
+                                        or any(x in ETAPAS_EXCLUSIVAS for x in em_execucao.values())):
+                        continue
+                    print(f"\n[Headless] Iniciando Função {e}: {etapas[e][0]}")
+                    em_execucao[executor.submit(etapas[e][3])] = e
+
+            if not em_execucao:
+                continue
+
+            concluidas, _ = concurrent.futures.wait(em_execucao, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in concluidas:
+                e = em_execucao.pop(future)
+                try:
+                    future.result()
+                    status[e] = "ok"
+                    print(f"\n[Headless] Função {e} concluída.")
+                except Exception as exc:
+                    status[e] = "erro"
+                    print(f"\n[Headless] Função {e} falhou: {exc}")
+
+    print("\n--- Resumo do pipeline headless ---")
+    for e in selecionadas:
+        print(f"  Função {e} ({etapas[e][0]}): {status[e]}")
+    return status
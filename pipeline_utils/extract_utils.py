@@ -3,59 +3,112 @@ Módulo para a Função 1b: Extrair sequências de todos os outputs.
 """
 
 import os
-from Bio import SeqIO
+import numpy as np
+import pandas as pd
 import config 
+from pipeline_utils import filter_utils
+from pipeline_utils import fasta_index_utils
 
-def extrair_outputs_fasta(df_output, outputs_de_interesse, metodo_escolhido, dir_leitura_fasta, dir_escrita_dominios):
+def _buffer_de_residuos(sequencias, ids):
+    """
+    Concatena as sequências de 'ids' (na ordem dada) num único buffer de bytes.
+    Retorna (buffer, inicio de cada sequência, tamanho de cada sequência);
+    IDs ausentes ficam com tamanho -1.
+    """
+    partes = [sequencias.get(i, b"") for i in ids]
+    tamanhos = np.array([len(seq) for seq in partes], dtype=np.int64)
+    inicios = np.concatenate(([0], np.cumsum(tamanhos)[:-1])).astype(np.int64)
+    presentes = np.array([i in sequencias for i in ids], dtype=bool)
+    return b"".join(partes), inicios, np.where(presentes, tamanhos, -1)
+
+def extrair_outputs_fasta(df_output, outputs_de_interesse, metodo_escolhido, dir_leitura_fasta, dir_escrita_dominios, caminho_fasta_origem=None, sequencias=None, rotulo=None):
     """
     Recebe os resultados da Função 1a, lê o FASTA filtrado de
     'Funcao1_Filtrar' e salva os domínios separados em 'Funcao2a_Separar'.
+    Com 'caminho_fasta_origem', as sequências vêm direto do FASTA de entrada
+    (pelo índice em disco), sem reler o FASTA filtrado.
+    'sequencias' ({id: resíduos em bytes}) evita qualquer leitura de FASTA.
+    Todos os hits são rotulados de uma vez e os recortes são feitos sobre
+    um buffer único de resíduos. O 'rotulo' da seleção (modo em lote) entra
+    no nome dos arquivos junto com o método. Retorna True se a extração foi feita e None em caso de erro.
     """
     try:
         if df_output is None or df_output.empty:
             print("\n[ERRO] Os dados de filtragem (df_output) estão vazios.")
             return
 
-        print("\nLendo arquivo FASTA das proteínas filtradas...")
-        
-        arquivo_fasta_filtrado = os.path.join(dir_leitura_fasta, f"proteinas_filtradas_{metodo_escolhido}.fasta")
-        
-        if not os.path.exists(arquivo_fasta_filtrado):
-            print(f"\n[ERRO] Arquivo FASTA filtrado não encontrado: {arquivo_fasta_filtrado}")
-            return
-        
-        seq_dict = {record.id: record for record in SeqIO.parse(arquivo_fasta_filtrado, "fasta")}
+        nome = filter_utils.nome_selecao(metodo_escolhido, rotulo)
+        codigos, ids = pd.factorize(df_output[config.coluna_id])
+        if sequencias is None:
+            if caminho_fasta_origem:
+                print("\nLendo sequências do FASTA de entrada (índice)...")
+                arquivo_fasta = caminho_fasta_origem
+            else:
+                print("\nLendo arquivo FASTA das proteínas filtradas...")
+                arquivo_fasta = os.path.join(dir_leitura_fasta, f"proteinas_filtradas_{nome}.fasta")
+
+            if not os.path.exists(arquivo_fasta):
+                print(f"\n[ERRO] Arquivo FASTA filtrado não encontrado: {arquivo_fasta}")
+                return
+            sequencias = fasta_index_utils.ler_sequencias(arquivo_fasta, ids)
+
+        buffer, inicios_seq, tamanhos_seq = _buffer_de_residuos(sequencias, ids)
+
+        # Posições dos recortes no buffer (mesma semântica de seq[start - 1:end]).
+        starts = df_output[config.coluna_start].to_numpy(np.int64)
+        ends = df_output[config.coluna_end].to_numpy(np.int64)
+        tamanhos = np.maximum(tamanhos_seq[codigos], 0)
+        ini = inicios_seq[codigos] + np.clip(starts - 1, 0, tamanhos)
+        fim = inicios_seq[codigos] + np.clip(ends, 0, tamanhos)
+        fim = np.maximum(fim, ini)
+        ausentes = tamanhos_seq[codigos] < 0
 
-        for dominio in outputs_de_interesse:
+        presenca = filter_utils.matriz_dominios(df_output, outputs_de_interesse).to_numpy()
+        ids_hits = ids.to_numpy()[codigos]
+
+        for j, dominio in enumerate(outputs_de_interesse):
             # Remove espaços e vírgulas para nomear o arquivo
             output_name = dominio.replace(" ", "_").replace(",", "")
             
-            arquivo_fasta_output = os.path.join(dir_escrita_dominios, f"{output_name}_{metodo_escolhido}.fasta")
-            
-            df_dominio = df_output[df_output[config.coluna_output].str.contains(dominio, case=False, na=False)]
+            arquivo_fasta_output = os.path.join(dir_escrita_dominios, f"{output_name}_{nome}.fasta")
 
-            if df_dominio.empty:
+            hits = np.flatnonzero(presenca[:, j])
+            if hits.size == 0:
                 print(f"\nNenhuma ocorrência do output '{dominio}' encontrada nos dados.")
                 continue
 
-            with open(arquivo_fasta_output, 'w') as fasta_out:
-                for _, row in df_dominio.iterrows():
-                    prot_id = row[config.coluna_id]
-                    start = int(row[config.coluna_start])
-                    end = int(row[config.coluna_end])
-
-                    if prot_id not in seq_dict:
-                        print(f"Aviso: ID {prot_id} encontrado no TSV mas não no FASTA filtrado.")
+            with open(arquivo_fasta_output, 'wb', buffering=1024 * 1024) as fasta_out:
+                for h in hits:
+                    if ausentes[h]:
+                        print(f"Aviso: ID {ids_hits[h]} encontrado no TSV mas não no FASTA filtrado.")
                         continue
-
-                    seq_completa = seq_dict[prot_id].seq
-                    sub_seq = seq_completa[start - 1:end]
-                    
-                    header = f">{prot_id}_{output_name}_{start}_{end}"
-                    fasta_out.write(f"{header}\n{sub_seq}\n")
+                    header = f">{ids_hits[h]}_{output_name}_{starts[h]}_{ends[h]}\n".encode()
+                    fasta_out.write(header + buffer[ini[h]:fim[h]] + b"\n")
 
             print(f"Sequências do output '{dominio}' salvas em: '{arquivo_fasta_output}'")
         print("\nExtração (Função 1b) concluída com sucesso.")
+        return True
 
     except Exception as e:
-        print(f"\nErro inesperado ao extrair as sequências dos domínios: {e}")
\ No newline at end of file
+        print(f"\nErro inesperado ao extrair as sequências dos domínios: {e}")
+
+def extrair_outputs_em_lote(resultados, dir_leitura_fasta, dir_escrita_dominios, caminho_fasta_origem):
+    """
+    Extrai os domínios de todas as seleções do modo em lote
+    ('filter_utils.filtrar_selecoes_em_lote'), lendo as sequências do
+    FASTA de entrada uma única vez; cada seleção grava com o seu rótulo.
+    Retorna True só se todas as seleções foram extraídas.
+    """
+    if not resultados:
+        print("\n[ERRO] Nenhuma seleção com resultados para extrair.")
+        return None
+    todos_ids = pd.unique(pd.concat([r[0][config.coluna_id] for r in resultados]))
+    sequencias = fasta_index_utils.ler_sequencias(caminho_fasta_origem, todos_ids)
+    extraidas = [
+        extrair_outputs_fasta(
+            df_output, outputs_de_interesse, metodo_escolhido, dir_leitura_fasta, dir_escrita_dominios,
+            sequencias=sequencias, rotulo=rotulo
+        )
+        for df_output, outputs_de_interesse, metodo_escolhido, rotulo in resultados
+    ]
+    return all(extraidas)
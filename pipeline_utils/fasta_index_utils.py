@@ -0,0 +1,119 @@
+"""
+Módulo de apoio às Funções 1a/1b: índice em disco de arquivos FASTA.
+Guarda, para cada ID, a posição (em bytes) do registro no arquivo, para
+buscar poucas sequências sem carregar o FASTA inteiro em memória.
+"""
+
+import io
+import os
+import sqlite3
+from Bio import SeqIO
+
+def _caminho_indice(caminho_fasta):
+    return caminho_fasta + ".idx.sqlite"
+
+def _assinatura(caminho_fasta):
+    estado = os.stat(caminho_fasta)
+    return estado.st_size, estado.st_mtime_ns
+
+def _construir_indice(caminho_fasta, caminho_indice):
+    """
+    Varre o FASTA uma vez e grava (id, início, tamanho) de cada registro.
+    O ID é o mesmo do SeqIO (primeira palavra do cabeçalho); em IDs
+    repetidos vale o último, como no dicionário '{record.id: record}'.
+    """
+    tamanho, mtime = _assinatura(caminho_fasta)
+    temporario = caminho_indice + ".tmp"
+    if os.path.exists(temporario):
+        os.remove(temporario)
+
+    conexao = sqlite3.connect(temporario)
+    try:
+        conexao.execute("CREATE TABLE meta (tamanho INTEGER, mtime INTEGER)")
+        conexao.execute("CREATE TABLE registros (id TEXT PRIMARY KEY, inicio INTEGER, tamanho INTEGER)")
+        conexao.execute("INSERT INTO meta VALUES (?, ?)", (tamanho, mtime))
+
+        def registros():
+            posicao = 0
+            atual = None
+            with open(caminho_fasta, 'rb') as f:
+                for linha in f:
+                    if linha.startswith(b">"):
+                        if atual is not None:
+                            yield atual[0], atual[1], posicao - atual[1]
+                        partes = linha[1:].split(None, 1)
+                        atual = (partes[0].decode() if partes else "", posicao)
+                    posicao += len(linha)
+            if atual is not None:
+                yield atual[0], atual[1], posicao - atual[1]
+
+        conexao.executemany("INSERT OR REPLACE INTO registros VALUES (?, ?, ?)", registros())
+        conexao.commit()
+    finally:
+        conexao.close()
+    os.replace(temporario, caminho_indice)
+
+def indexar_fasta(caminho_fasta):
+    """
+    Garante que o índice '<fasta>.idx.sqlite' existe e corresponde ao
+    arquivo atual (tamanho e data de modificação); reconstrói se não.
+    Retorna o caminho do índice.
+    """
+    caminho_indice = _caminho_indice(caminho_fasta)
+    if os.path.exists(caminho_indice):
+        conexao = sqlite3.connect(caminho_indice)
+        try:
+            meta = conexao.execute("SELECT tamanho, mtime FROM meta").fetchone()
+        except sqlite3.DatabaseError:
+            meta = None
+        finally:
+            conexao.close()
+        if meta == _assinatura(caminho_fasta):
+            return caminho_indice
+
+    print(f"Indexando {os.path.basename(caminho_fasta)}...")
+    _construir_indice(caminho_fasta, caminho_indice)
+    return caminho_indice
+
+def _posicoes(caminho_fasta, ids):
+    """Retorna [(id, início, tamanho)] dos 'ids' presentes, na ordem do arquivo."""
+    ids = list(dict.fromkeys(ids))
+    conexao = sqlite3.connect(indexar_fasta(caminho_fasta))
+    try:
+        posicoes = []
+        for i in range(0, len(ids), 900):
+            lote = ids[i:i + 900]
+            marcadores = ",".join("?" * len(lote))
+            posicoes.extend(conexao.execute(
+                f"SELECT id, inicio, tamanho FROM registros WHERE id IN ({marcadores})", lote
+            ))
+    finally:
+        conexao.close()
+    return sorted(posicoes, key=lambda p: p[1])
+
+def _ler_trechos(caminho_fasta, ids):
+    """Gera (id, bytes do registro completo) para os 'ids' presentes."""
+    with open(caminho_fasta, 'rb') as f:
+        for prot_id, inicio, tamanho in _posicoes(caminho_fasta, ids):
+            f.seek(inicio)
+            yield prot_id, f.read(tamanho)
+
+def ler_registros(caminho_fasta, ids):
+    """
+    Retorna {id: SeqRecord} apenas para os 'ids' presentes no FASTA,
+    lendo direto das posições guardadas no índice.
+    """
+    return {
+        prot_id: SeqIO.read(io.StringIO(texto.decode()), "fasta")
+        for prot_id, texto in _ler_trechos(caminho_fasta, ids)
+    }
+
+def ler_sequencias(caminho_fasta, ids):
+    """
+    Como 'ler_registros', mas retorna só os resíduos em bytes ({id: b"MKV..."}),
+    sem criar SeqRecords. Útil quando muitas sequências são recortadas.
+    """
+    return {
+        prot_id: b"".join(texto.split(b"\n", 1)[1].split()) if b"\n" in texto else b""
+        for prot_id, texto in _ler_trechos(caminho_fasta, ids)
+    }
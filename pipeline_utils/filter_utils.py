@@ -3,50 +3,502 @@ Módulo para a Função 1a: Filtrar por domínios e método.
 """
 
 import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
 import pandas as pd
 from Bio import SeqIO
 import config 
+from pipeline_utils import fasta_index_utils
 
-def filtrar_por_dominios_e_metodo(caminho_tsv, caminho_fasta, output_dir):
+COLUNAS_INTERPRO = {
+    config.coluna_id: str,
+    config.coluna_metodo: "category",
+    config.coluna_output: "category",
+    config.coluna_start: "int32",
+    config.coluna_end: "int32",
+}
+
+def _ler_interpro_em_blocos(caminho_tsv):
+    """
+    Lê o TSV do InterPro em blocos de 'config.interpro_chunksize' linhas,
+    carregando só as colunas usadas pelo pipeline, com tipos compactos.
+    """
+    return pd.read_csv(
+        caminho_tsv, sep='\t', header=None,
+        usecols=list(COLUNAS_INTERPRO), dtype=COLUNAS_INTERPRO,
+        chunksize=config.interpro_chunksize,
+    )
+
+def _pasta_cache_interpro(caminho_tsv):
+    """
+    Pasta do cache colunar de um TSV, identificada por caminho, tamanho e
+    data de modificação (qualquer alteração no arquivo gera outra chave).
+    """
+    estado = os.stat(caminho_tsv)
+    chave = f"{os.path.abspath(caminho_tsv)}|{estado.st_size}|{estado.st_mtime_ns}"
+    return os.path.join(config.interpro_cache_dir, hashlib.sha256(chave.encode()).hexdigest()[:16])
+
+def _codificar(coluna, codigos):
+    """
+    Converte os textos de um bloco em códigos inteiros globais (-1 para vazios),
+    acrescentando os textos novos ao dicionário 'codigos'.
+    """
+    locais, unicos = pd.factorize(coluna)
+    mapa = np.array([codigos.setdefault(str(u), len(codigos)) for u in unicos] + [-1], dtype=np.int32)
+    return mapa[locais]
+
+def _coluna_cache(pasta, nome, tipo):
+    return np.memmap(os.path.join(pasta, f"{nome}.bin"), dtype=tipo, mode='r')
+
+def _construir_cache_interpro(caminho_tsv, pasta_cache):
+    """
+    Monta o cache numa pasta temporária própria desta execução e a renomeia
+    no final (execuções simultâneas não se atrapalham). Depois apaga os
+    caches antigos do mesmo TSV.
+    """
+    temporaria = tempfile.mkdtemp(prefix=os.path.basename(pasta_cache) + ".", suffix=".tmp",
+                                  dir=os.path.dirname(pasta_cache))
+    try:
+        _gravar_cache_interpro(caminho_tsv, temporaria)
+        if not os.path.exists(os.path.join(pasta_cache, "meta.json")):
+            shutil.rmtree(pasta_cache, ignore_errors=True)  # cache incompleto
+        try:
+            os.rename(temporaria, pasta_cache)
+        except OSError:
+            # Outra execução terminou antes: mantém o cache dela.
+            if not os.path.exists(os.path.join(pasta_cache, "meta.json")):
+                raise
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+    _remover_caches_antigos(caminho_tsv, pasta_cache)
+
+def _remover_caches_antigos(caminho_tsv, pasta_cache):
+    """Apaga os caches do mesmo TSV com chave antiga (arquivo alterado depois)."""
+    caminho_tsv = os.path.abspath(caminho_tsv)
+    for nome in os.listdir(config.interpro_cache_dir):
+        pasta = os.path.join(config.interpro_cache_dir, nome)
+        if pasta == pasta_cache or nome.endswith(".tmp"):
+            continue
+        try:
+            with open(os.path.join(pasta, "meta.json"), 'r') as f:
+                antigo = json.load(f).get("tsv") == caminho_tsv
+        except (OSError, ValueError):
+            continue
+        if antigo:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+def _gravar_cache_interpro(caminho_tsv, temporaria):
+    """
+    Lê o TSV uma vez (em blocos) e grava as colunas como arquivos binários
+    separados por método: m<i>/{id,output,start,end,linha}.bin. IDs e outputs
+    viram códigos inteiros; os textos ficam em ids.bin (+ offsets) e no meta.json.
+    """
+
+    codigos_id, codigos_output, metodos = {}, {}, {}
+    arquivos = {}
+    try:
+        for bloco in _ler_interpro_em_blocos(caminho_tsv):
+            bloco = bloco.dropna(subset=[config.coluna_metodo])
+            ids = _codificar(bloco[config.coluna_id], codigos_id)
+            outputs = _codificar(bloco[config.coluna_output], codigos_output)
+
+            colunas_metodo = bloco[config.coluna_metodo].astype(str).to_numpy()
+            for m in np.unique(colunas_metodo):
+                if m not in metodos:
+                    metodos[m] = {"pasta": f"m{len(metodos)}", "linhas": 0, "outputs": set()}
+                    os.makedirs(os.path.join(temporaria, metodos[m]["pasta"]))
+                    arquivos[m] = {
+                        nome: open(os.path.join(temporaria, metodos[m]["pasta"], f"{nome}.bin"), 'wb')
+                        for nome in ("id", "output", "start", "end", "linha")
+                    }
+                sel = colunas_metodo == m
+                metodos[m]["linhas"] += int(sel.sum())
+                metodos[m]["outputs"].update(int(c) for c in np.unique(outputs[sel]) if c >= 0)
+                arquivos[m]["id"].write(ids[sel].tobytes())
+                arquivos[m]["output"].write(outputs[sel].tobytes())
+                arquivos[m]["start"].write(bloco[config.coluna_start].to_numpy(np.int32)[sel].tobytes())
+                arquivos[m]["end"].write(bloco[config.coluna_end].to_numpy(np.int32)[sel].tobytes())
+                arquivos[m]["linha"].write(bloco.index.to_numpy(np.int64)[sel].tobytes())
+    finally:
+        for grupo in arquivos.values():
+            for f in grupo.values():
+                f.close()
+
+    textos = [i.encode() for i in codigos_id]
+    with open(os.path.join(temporaria, "ids.bin"), 'wb') as f:
+        f.write(b"".join(textos))
+    np.cumsum([0] + [len(t) for t in textos], dtype=np.int64).tofile(os.path.join(temporaria, "ids_offsets.bin"))
+
+    for m in metodos.values():
+        m["outputs"] = sorted(m["outputs"])
+    with open(os.path.join(temporaria, "meta.json"), 'w') as f:
+        json.dump({"tsv": os.path.abspath(caminho_tsv), "outputs": list(codigos_output), "metodos": metodos}, f)
+
+def _abrir_cache_interpro(caminho_tsv):
+    """
+    Retorna (pasta, meta) do cache colunar do TSV, construindo-o na primeira vez.
+    """
+    pasta_cache = _pasta_cache_interpro(caminho_tsv)
+    caminho_meta = os.path.join(pasta_cache, "meta.json")
+    if not os.path.exists(caminho_meta):
+        print(f"Criando cache colunar de {os.path.basename(caminho_tsv)}...")
+        os.makedirs(config.interpro_cache_dir, exist_ok=True)
+        _construir_cache_interpro(caminho_tsv, pasta_cache)
+    with open(caminho_meta, 'r') as f:
+        return pasta_cache, json.load(f)
+
+def _ler_linhas_do_cache(caminho_tsv, metodo, busca):
+    """
+    Versão de 'ler_linhas_filtradas' que mapeia (np.memmap) só as colunas
+    dos métodos escolhidos, em vez de reler o TSV.
+    """
+    pasta_cache, meta = _abrir_cache_interpro(caminho_tsv)
+    nomes_outputs = pd.Series(meta["outputs"], dtype=object)
+    casam = np.flatnonzero(nomes_outputs.str.contains(busca, case=False, na=False).to_numpy(bool))
+
+    partes = []
+    for m, info in meta["metodos"].items():
+        if m.lower() != metodo.lower() or not info["linhas"]:
+            continue
+        pasta = os.path.join(pasta_cache, info["pasta"])
+        outputs = _coluna_cache(pasta, "output", np.int32)
+        sel = np.flatnonzero(np.isin(outputs, casam))
+        if sel.size:
+            partes.append((
+                m, _coluna_cache(pasta, "id", np.int32)[sel], outputs[sel],
+                _coluna_cache(pasta, "start", np.int32)[sel], _coluna_cache(pasta, "end", np.int32)[sel],
+                _coluna_cache(pasta, "linha", np.int64)[sel],
+            ))
+
+    if not partes:
+        return pd.DataFrame(columns=list(COLUNAS_INTERPRO))
+
+    ids = np.concatenate([p[1] for p in partes])
+    offsets = np.memmap(os.path.join(pasta_cache, "ids_offsets.bin"), dtype=np.int64, mode='r')
+    with open(os.path.join(pasta_cache, "ids.bin"), 'rb') as f:
+        textos = {}
+        for codigo in np.unique(ids):
+            f.seek(offsets[codigo])
+            textos[codigo] = f.read(offsets[codigo + 1] - offsets[codigo]).decode()
+
+    colunas = {
+        config.coluna_id: [textos[c] for c in ids],
+        config.coluna_metodo: np.repeat([p[0] for p in partes], [len(p[1]) for p in partes]),
+        config.coluna_output: nomes_outputs.to_numpy()[np.concatenate([p[2] for p in partes])],
+        config.coluna_start: np.concatenate([p[3] for p in partes]),
+        config.coluna_end: np.concatenate([p[4] for p in partes]),
+    }
+    df_output = pd.DataFrame(
+        {c: colunas[c] for c in COLUNAS_INTERPRO}, index=np.concatenate([p[5] for p in partes])
+    ).sort_index()
+    for coluna in (config.coluna_metodo, config.coluna_output):
+        df_output[coluna] = df_output[coluna].astype(str).astype("category")
+    return df_output
+
+def catalogar_interpro(caminho_tsv):
+    """
+    Primeira passada pelo TSV: retorna {método: conjunto de outputs}
+    sem manter as linhas em memória. Com 'config.interpro_cache', lê
+    o catálogo do cache colunar (criando-o se preciso).
+    """
+    if config.interpro_cache:
+        _, meta = _abrir_cache_interpro(caminho_tsv)
+        return {m: {meta["outputs"][c] for c in info["outputs"]} for m, info in meta["metodos"].items()}
+
+    catalogo = {}
+    for bloco in _ler_interpro_em_blocos(caminho_tsv):
+        pares = bloco[[config.coluna_metodo, config.coluna_output]].dropna().drop_duplicates()
+        for m, dom in zip(pares[config.coluna_metodo].astype(str), pares[config.coluna_output].astype(str)):
+            catalogo.setdefault(m, set()).add(dom)
+    return catalogo
+
+def ler_linhas_filtradas(caminho_tsv, metodo, outputs_de_interesse):
+    """
+    Segunda passada pelo TSV: mantém só as linhas do 'metodo' (sem diferenciar
+    maiúsculas) cujo output contém algum dos 'outputs_de_interesse'.
+    """
+    busca = '|'.join(outputs_de_interesse)
+    if config.interpro_cache:
+        return _ler_linhas_do_cache(caminho_tsv, metodo, busca)
+
+    partes = []
+    for bloco in _ler_interpro_em_blocos(caminho_tsv):
+        mascara = (
+            (bloco[config.coluna_metodo].str.lower() == metodo.lower())
+            & bloco[config.coluna_output].str.contains(busca, case=False, na=False)
+        )
+        if mascara.any():
+            partes.append(bloco[mascara.to_numpy()])
+
+    if not partes:
+        return pd.DataFrame(columns=list(COLUNAS_INTERPRO))
+    df_output = pd.concat(partes)
+    for coluna in (config.coluna_metodo, config.coluna_output):
+        df_output[coluna] = df_output[coluna].astype(str).astype("category")
+    return df_output
+
+def matriz_dominios(df, outputs_de_interesse):
+    """
+    Retorna um DataFrame booleano (linhas de 'df' x outputs) indicando se a
+    coluna de output de cada linha contém cada um dos outputs de interesse.
+    """
+    coluna = df[config.coluna_output]
+    return pd.DataFrame(
+        {d: coluna.str.contains(d, case=False, na=False) for d in outputs_de_interesse},
+        index=df.index,
+    )
+
+def sumarizar_proteinas(df_output, outputs_de_interesse):
+    """
+    Agrupa a matriz de domínios por proteína numa única passada.
+    Retorna (DataFrame com ID_Proteina/outputs_encontrados ordenado por ID,
+    lista de proteínas que possuem todos os outputs).
+    """
+    presenca = matriz_dominios(df_output, outputs_de_interesse).groupby(df_output[config.coluna_id]).any()
+    presenca = presenca[presenca.any(axis=1)]
+
+    nomes = pd.Series(outputs_de_interesse).to_numpy()
+    df_final = pd.DataFrame({
+        'ID_Proteina': presenca.index,
+        'outputs_encontrados': [', '.join(nomes[linha]) for linha in presenca.to_numpy()],
+    })
+    proteinas_todos_dominios = presenca.index[presenca.all(axis=1)].tolist()
+    return df_final, proteinas_todos_dominios
+
+def _outputs_do_metodo(catalogo, metodo_escolhido):
+    """Outputs do método (sem diferenciar maiúsculas), em ordem alfabética."""
+    return sorted(set().union(
+        *(doms for m, doms in catalogo.items() if m.lower() == metodo_escolhido.lower())
+    ))
+
+def _validar_outputs(outputs, outputs_disponiveis, metodo_escolhido):
+    """Mantém só os outputs que existem no método, avisando sobre os demais."""
+    for o in outputs:
+        if o not in outputs_disponiveis:
+            print(f"Aviso: resultado '{o}' não existe para o método {metodo_escolhido}. Ignorado.")
+    return [o for o in outputs if o in outputs_disponiveis]
+
+def _ler_linhas_em_lote(caminho_tsv, pedidos):
+    """
+    Lê de uma só vez as linhas de vários métodos. 'pedidos' é
+    {método: outputs}; retorna (catálogo, {método: DataFrame}).
+    Sem o cache colunar, o TSV é percorrido uma única vez para montar o
+    catálogo e separar as linhas de todos os métodos ao mesmo tempo.
+    """
+    if config.interpro_cache:
+        catalogo = catalogar_interpro(caminho_tsv)
+        return catalogo, {m: ler_linhas_filtradas(caminho_tsv, m, outs) for m, outs in pedidos.items()}
+
+    catalogo = {}
+    partes = {m: [] for m in pedidos}
+    for bloco in _ler_interpro_em_blocos(caminho_tsv):
+        pares = bloco[[config.coluna_metodo, config.coluna_output]].dropna().drop_duplicates()
+        for m, dom in zip(pares[config.coluna_metodo].astype(str), pares[config.coluna_output].astype(str)):
+            catalogo.setdefault(m, set()).add(dom)
+
+        metodos_bloco = bloco[config.coluna_metodo].str.lower()
+        for m, outs in pedidos.items():
+            mascara = (metodos_bloco == m.lower()) & bloco[config.coluna_output].str.contains('|'.join(outs), case=False, na=False)
+            if mascara.any():
+                partes[m].append(bloco[mascara.to_numpy()])
+
+    linhas = {}
+    for m, lista in partes.items():
+        if not lista:
+            linhas[m] = pd.DataFrame(columns=list(COLUNAS_INTERPRO))
+            continue
+        df = pd.concat(lista)
+        for coluna in (config.coluna_metodo, config.coluna_output):
+            df[coluna] = df[coluna].astype(str).astype("category")
+        linhas[m] = df
+    return catalogo, linhas
+
+def _ler_selecao(selecao, indice):
+    """
+    Valida uma seleção do modo em lote e retorna (método, outputs, rótulo).
+    Aceita [método, [outputs]] ou {"metodo": ..., "outputs": [...], "rotulo": ...};
+    o rótulo é opcional. Formatos inválidos geram ValueError.
+    """
+    if isinstance(selecao, dict):
+        desconhecidas = set(selecao) - {"metodo", "outputs", "rotulo"}
+        if desconhecidas or "metodo" not in selecao or "outputs" not in selecao:
+            raise ValueError(f"Seleção {indice} inválida: use as chaves 'metodo', 'outputs' e (opcional) 'rotulo'.")
+        metodo, outputs, rotulo = selecao["metodo"], selecao["outputs"], selecao.get("rotulo")
+    elif isinstance(selecao, (list, tuple)) and len(selecao) == 2:
+        (metodo, outputs), rotulo = selecao, None
+    else:
+        raise ValueError(f"Seleção {indice} inválida: use [método, [outputs]] ou {{\"metodo\": ..., \"outputs\": [...]}}.")
+
+    if not isinstance(metodo, str) or not metodo.strip():
+        raise ValueError(f"Seleção {indice}: o método deve ser um texto não vazio.")
+    if not isinstance(outputs, (list, tuple)) or not outputs or not all(isinstance(o, str) for o in outputs):
+        raise ValueError(f"Seleção {indice}: 'outputs' deve ser uma lista de textos (ex: [\"EAL\", \"GGDEF\"]).")
+    if rotulo is not None and (not isinstance(rotulo, str) or not rotulo.strip()):
+        raise ValueError(f"Seleção {indice}: o rótulo deve ser um texto não vazio.")
+    return metodo, list(outputs), rotulo
+
+def filtrar_selecoes_em_lote(caminho_tsv, caminho_fasta, output_dir, selecoes):
+    """
+    Modo em lote (não interativo) da Função 1a: aplica várias seleções
+    (método, outputs) lendo o TSV e o FASTA uma única vez.
+    'selecoes' é uma lista de pares [método, [outputs]] ou de dicionários
+    {"metodo": ..., "outputs": [...], "rotulo": ...}. Gera os mesmos arquivos
+    que 'filtrar_por_dominios_e_metodo' para cada seleção e retorna a lista
+    de (df_output, outputs_de_interesse, metodo_escolhido, rotulo) das que
+    deram resultado. O rótulo entra no nome dos arquivos no lugar do método:
+    '<método>_<rotulo>' se informado, '<método>_<n>' (n = posição da seleção)
+    se o método se repete no lote, ou só o método.
+    """
+    try:
+        lidas = [_ler_selecao(selecao, n) for n, selecao in enumerate(selecoes, start=1)]
+    except ValueError as e:
+        print(f"\n[ERRO] {e}")
+        return []
+
+    repeticoes = pd.Series([m.lower() for m, _, _ in lidas]).value_counts()
+    pedidos, escolhas, rotulos = {}, [], set()
+    for n, (metodo, outputs, rotulo) in enumerate(lidas, start=1):
+        # Métodos repetidos são lidos uma vez só, com a união dos outputs.
+        chave = next((m for m in pedidos if m.lower() == metodo.lower()), metodo)
+        pedidos.setdefault(chave, [])
+        pedidos[chave] += [o for o in outputs if o not in pedidos[chave]]
+
+        if rotulo is not None:
+            rotulo = rotulo.strip().replace(" ", "_").replace(",", "")
+        elif repeticoes[metodo.lower()] > 1:
+            rotulo = str(n)
+        if (metodo.lower(), rotulo) in rotulos:
+            print(f"\n[ERRO] Seleção {n}: rótulo '{rotulo}' repetido para o método '{metodo}'.")
+            return []
+        rotulos.add((metodo.lower(), rotulo))
+        escolhas.append((chave, outputs, rotulo))
+
+    try:
+        catalogo, linhas = _ler_linhas_em_lote(caminho_tsv, pedidos)
+        metodos_disponiveis = sorted(catalogo)
+
+        resultados = []
+        for metodo, outputs, rotulo in escolhas:
+            metodo_escolhido = next((m for m in metodos_disponiveis if m.lower() == metodo.lower()), None)
+            if metodo_escolhido is None:
+                print(f"\n[ERRO] Método '{metodo}' não encontrado no arquivo.")
+                continue
+
+            print(f"\nMétodo selecionado: {metodo_escolhido}" + (f" (seleção '{rotulo}')" if rotulo else ""))
+            outputs_de_interesse = _validar_outputs(outputs, _outputs_do_metodo(catalogo, metodo_escolhido), metodo_escolhido)
+            if not outputs_de_interesse:
+                print("Nenhum resultado válido para este método.")
+                continue
+            print(f"Resultados selecionados: {', '.join(outputs_de_interesse)}")
+
+            df_metodo = linhas[metodo]
+            df_output = df_metodo[df_metodo[config.coluna_output].str.contains('|'.join(outputs_de_interesse), case=False, na=False).to_numpy(bool)].copy()
+            if isinstance(df_output[config.coluna_output].dtype, pd.CategoricalDtype):
+                df_output[config.coluna_output] = df_output[config.coluna_output].cat.remove_unused_categories()
+            if df_output.empty:
+                print(f"\nNenhuma proteína com os domínios {outputs_de_interesse} inferidos por {metodo_escolhido}.")
+                continue
+            resultados.append((df_output, outputs_de_interesse, metodo_escolhido, rotulo))
+
+        todos_ids = pd.unique(pd.concat([r[0][config.coluna_id] for r in resultados])) if resultados else []
+        seq_dict = fasta_index_utils.ler_registros(caminho_fasta, todos_ids)
+        for df_output, outputs_de_interesse, metodo_escolhido, rotulo in resultados:
+            _salvar_filtragem(df_output, outputs_de_interesse, metodo_escolhido, output_dir, seq_dict, rotulo=rotulo)
+
+        return resultados
+
+    except FileNotFoundError:
+        print(f"\n[ERRO] Arquivo não encontrado. Verifique os caminhos:")
+        print(f"TSV: {caminho_tsv}")
+        print(f"FASTA: {caminho_fasta}")
+        return []
+    except Exception as e:
+        print(f"\nOcorreu um erro: {e}")
+        return []
+
+def nome_selecao(metodo_escolhido, rotulo=None):
+    """Parte do nome dos arquivos de uma seleção: o método, seguido do rótulo se houver."""
+    return f"{metodo_escolhido}_{rotulo}" if rotulo else metodo_escolhido
+
+def _salvar_filtragem(df_output, outputs_de_interesse, metodo_escolhido, output_dir, seq_dict, rotulo=None):
+    """
+    Grava o sumário, a lista de proteínas com todos os outputs e o FASTA
+    das proteínas filtradas de uma seleção (método + outputs), com o
+    'rotulo' da seleção (se houver) no nome dos arquivos.
+    """
+    df_final, proteinas_todos_dominios = sumarizar_proteinas(df_output, outputs_de_interesse)
+    nome = nome_selecao(metodo_escolhido, rotulo)
+
+    tsv_saida = os.path.join(output_dir, f"sumario_{nome}.tsv")
+    df_final.to_csv(tsv_saida, sep='\t', index=False)
+    print(f"\n{len(df_final)} proteínas com os outputs de interesse ({metodo_escolhido}) foram encontradas.")
+    print(f"Arquivo salvo em: '{tsv_saida}'")
+
+    if proteinas_todos_dominios:
+        arquivo_tres_dominios = os.path.join(output_dir, f"proteinas_{nome}_todos_outputs.txt")
+        with open(arquivo_tres_dominios, 'w') as f:
+            for p in proteinas_todos_dominios:
+                f.write(f"{p}\n")
+        print(f"{len(proteinas_todos_dominios)} proteínas possuem todos os outputs informados.")
+        print(f"Lista salva em: '{arquivo_tres_dominios}'")
+    else:
+        print("\nNenhuma proteína possui simultaneamente todos os domínios informados.")
+
+    ids_filtrados = set(df_output[config.coluna_id].unique())
+
+    arquivo_fasta_filtrado = os.path.join(output_dir, f"proteinas_filtradas_{nome}.fasta")
+    with open(arquivo_fasta_filtrado, 'w') as out_fasta:
+        for prot_id in ids_filtrados:
+            if prot_id in seq_dict:
+                SeqIO.write(seq_dict[prot_id], out_fasta, "fasta")
+    print(f"FASTA das proteínas filtradas salvo em: '{arquivo_fasta_filtrado}'")
+
+def filtrar_por_dominios_e_metodo(caminho_tsv, caminho_fasta, output_dir, metodo=None, outputs=None):
     """
     Filtra o TSV do InterPro e o FASTA de entrada.
     Salva os resultados em 'Funcao1_Filtrar'.
+    Se 'metodo' e 'outputs' forem informados, não pergunta nada (modo headless).
     """
     try:
-        df = pd.read_csv(caminho_tsv, sep='\t', header=None)
-        
-        df[config.coluna_output] = df[config.coluna_output].astype(str)
-        df[config.coluna_metodo] = df[config.coluna_metodo].astype(str)
+        catalogo = catalogar_interpro(caminho_tsv)
 
-        metodos_disponiveis = sorted(df[config.coluna_metodo].dropna().unique())
+        metodos_disponiveis = sorted(catalogo)
         print("\nMétodos de predição encontrados no arquivo:\n")
-        for i, metodo in enumerate(metodos_disponiveis, start=1):
-            print(f"{i}. {metodo}")
+        for i, m in enumerate(metodos_disponiveis, start=1):
+            print(f"{i}. {m}")
 
-        while True:
+        while metodo is None:
             try:
                 escolha = int(input("\nDigite o número do método que deseja utilizar: "))
                 if 1 <= escolha <= len(metodos_disponiveis):
-                    metodo_escolhido = metodos_disponiveis[escolha - 1]
-                    break
+                    metodo = metodos_disponiveis[escolha - 1]
                 else:
                     print("Número inválido. Tente novamente.")
             except ValueError:
                 print("Entrada inválida. Digite apenas o número correspondente ao método.")
 
-        print(f"\nMétodo selecionado: {metodo_escolhido}")
-        df_metodo = df[df[config.coluna_metodo].str.lower() == metodo_escolhido.lower()]
+        metodo_escolhido = next((m for m in metodos_disponiveis if m.lower() == metodo.lower()), None)
+        if metodo_escolhido is None:
+            print(f"\n[ERRO] Método '{metodo}' não encontrado no arquivo.")
+            return None, None, None
 
-        outputs_disponiveis = sorted(df_metodo[config.coluna_output].dropna().unique())
+        print(f"\nMétodo selecionado: {metodo_escolhido}")
+        outputs_disponiveis = _outputs_do_metodo(catalogo, metodo_escolhido)
         print("\nResultados disponíveis neste método:\n")
         for i, dom in enumerate(outputs_disponiveis, start=1):
             print(f"{i}. {dom}")
 
-        outputs_input = input("\nDigite o(s) número(s) do(s) resultado(s) de seu interesse seguido de vírgulas (Ex. 1, 3, 4, 8): ").strip()
         outputs_de_interesse = []
-        if all(item.strip().isdigit() for item in outputs_input.split(',')):
-            indices = [int(i.strip()) for i in outputs_input.split(',') if i.strip().isdigit()]
-            outputs_de_interesse = [outputs_disponiveis[i - 1] for i in indices if 1 <= i <= len(outputs_disponiveis)]
+        if outputs is not None:
+            outputs_de_interesse = _validar_outputs(outputs, outputs_disponiveis, metodo_escolhido)
+        else:
+            outputs_input = input("\nDigite o(s) número(s) do(s) resultado(s) de seu interesse seguido de vírgulas (Ex. 1, 3, 4, 8): ").strip()
+            if all(item.strip().isdigit() for item in outputs_input.split(',')):
+                indices = [int(i.strip()) for i in outputs_input.split(',') if i.strip().isdigit()]
+                outputs_de_interesse = [outputs_disponiveis[i - 1] for i in indices if 1 <= i <= len(outputs_disponiveis)]
 
         if not outputs_de_interesse:
             print("Nenhum resultado foi informado. Encerrando.")
@@ -54,56 +506,14 @@ def filtrar_por_dominios_e_metodo(caminho_tsv, caminho_fasta, output_dir):
 
         print(f"\nResultados selecionados: {', '.join(outputs_de_interesse)}")
 
-        busca = '|'.join(outputs_de_interesse)
-        df_output = df_metodo[df_metodo[config.coluna_output].str.contains(busca, case=False, na=False)].copy()
+        df_output = ler_linhas_filtradas(caminho_tsv, metodo_escolhido, outputs_de_interesse)
 
         if df_output.empty:
             print(f"\nNenhuma proteína com os domínios {outputs_de_interesse} inferidos por {metodo_escolhido}.")
             return None, None, None
 
-        ids_unicos = df_output[config.coluna_id].unique()
-        resultados_sumarizados = []
-        proteinas_todos_dominios = []
-
-        for proteina_id in sorted(ids_unicos):
-            df_proteina = df_output[df_output[config.coluna_id] == proteina_id]
-            outputs_encontrados = [d for d in outputs_de_interesse
-                                    if df_proteina[config.coluna_output].str.contains(d, case=False).any()]
-
-            if outputs_encontrados:
-                resultados_sumarizados.append({
-                    'ID_Proteina': proteina_id,
-                    'outputs_encontrados': ', '.join(outputs_encontrados)
-                })
-
-                if all(d in outputs_encontrados for d in outputs_de_interesse):
-                    proteinas_todos_dominios.append(proteina_id)
-
-        tsv_saida = os.path.join(output_dir, f"sumario_{metodo_escolhido}.tsv")
-        df_final = pd.DataFrame(resultados_sumarizados)
-        df_final.to_csv(tsv_saida, sep='\t', index=False)
-        print(f"\n{len(df_final)} proteínas com os outputs de interesse ({metodo_escolhido}) foram encontradas.")
-        print(f"Arquivo salvo em: '{tsv_saida}'")
-
-        if proteinas_todos_dominios:
-            arquivo_tres_dominios = os.path.join(output_dir, f"proteinas_{metodo_escolhido}_todos_outputs.txt")
-            with open(arquivo_tres_dominios, 'w') as f:
-                for p in proteinas_todos_dominios:
-                    f.write(f"{p}\n")
-            print(f"{len(proteinas_todos_dominios)} proteínas possuem todos os outputs informados.")
-            print(f"Lista salva em: '{arquivo_tres_dominios}'")
-        else:
-            print("\nNenhuma proteína possui simultaneamente todos os domínios informados.")
-
-        seq_dict = {record.id: record for record in SeqIO.parse(caminho_fasta, "fasta")}
-        ids_filtrados = set(df_output[config.coluna_id].unique())
-
-        arquivo_fasta_filtrado = os.path.join(output_dir, f"proteinas_filtradas_{metodo_escolhido}.fasta")
-        with open(arquivo_fasta_filtrado, 'w') as out_fasta:
-            for prot_id in ids_filtrados:
-                if prot_id in seq_dict:
-                    SeqIO.write(seq_dict[prot_id], out_fasta, "fasta")
-        print(f"FASTA das proteínas filtradas salvo em: '{arquivo_fasta_filtrado}'")
+        seq_dict = fasta_index_utils.ler_registros(caminho_fasta, df_output[config.coluna_id].unique())
+        _salvar_filtragem(df_output, outputs_de_interesse, metodo_escolhido, output_dir, seq_dict)
 
         return df_output, outputs_de_interesse, metodo_escolhido
 
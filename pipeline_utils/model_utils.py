@@ -4,12 +4,83 @@ Módulo para a Função 1c: Enviar (preparar) sequências para modelagem.
 
 import os
 import re
+import sqlite3
 from Bio import SeqIO
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+import config
+
+# Pacote: um SQLite por FASTA de origem, com uma linha por sequência.
+# 'nome' é o mesmo nome que o arquivo individual teria (sem o '.fasta').
+PACOTE_SUFIXO = ".pack.sqlite"
+
+def nome_individual(record):
+    """Nome do FASTA individual de um registro (ID com caracteres seguros)."""
+    return re.sub(r'[^A-Za-z0-9_-]', '_', record.id)
+
+def gravar_pacote(registros, caminho_pacote):
+    """
+    Grava os SeqRecords num pacote, numa única passada. Como nos arquivos
+    individuais, um nome repetido fica com o último registro.
+    Retorna o número de sequências no pacote.
+    """
+    temporario = caminho_pacote + ".tmp"
+    if os.path.exists(temporario):
+        os.remove(temporario)
+    conexao = sqlite3.connect(temporario)
+    try:
+        conexao.execute(
+            "CREATE TABLE sequencias (nome TEXT PRIMARY KEY, id TEXT NOT NULL, descricao TEXT NOT NULL, seq TEXT NOT NULL)"
+        )
+        conexao.executemany(
+            "INSERT OR REPLACE INTO sequencias VALUES (?, ?, ?, ?)",
+            ((nome_individual(r), r.id, r.description, str(r.seq)) for r in registros),
+        )
+        total = conexao.execute("SELECT COUNT(*) FROM sequencias").fetchone()[0]
+        conexao.commit()
+    finally:
+        conexao.close()
+    os.replace(temporario, caminho_pacote)
+    return total
+
+def _record(id_seq, descricao, seq):
+    return SeqRecord(Seq(seq), id=id_seq, name=id_seq, description=descricao)
+
+def listar_pacote(caminho_pacote):
+    """Gera (nome, SeqRecord) de todas as sequências do pacote, na ordem de gravação."""
+    conexao = sqlite3.connect(caminho_pacote)
+    try:
+        for nome, id_seq, descricao, seq in conexao.execute(
+            "SELECT nome, id, descricao, seq FROM sequencias ORDER BY rowid"
+        ):
+            yield nome, _record(id_seq, descricao, seq)
+    finally:
+        conexao.close()
+
+def exportar_pacote(caminho_pacote, subpasta):
+    """
+    Exportação opcional: materializa um '.fasta' por sequência do pacote,
+    idêntico ao que o modo 'arquivos' gravaria. Retorna a lista de arquivos.
+    """
+    os.makedirs(subpasta, exist_ok=True)
+    arquivos = []
+    for nome, record in listar_pacote(caminho_pacote):
+        arquivo_individual = os.path.join(subpasta, f"{nome}.fasta")
+        with open(arquivo_individual, 'w') as f:
+            SeqIO.write(record, f, "fasta")
+        arquivos.append(arquivo_individual)
+    return arquivos
+
+def _remover_se_vazia(pasta):
+    if not os.listdir(pasta):
+        os.rmdir(pasta)
 
 def enviar_para_modelagem(dir_leitura_fasta, dir_escrita_model):
     """
-    Lê TODOS os arquivos FASTA de 'Funcao1_Filtrar', 'Funcao2a_Separar' ou 'input' 
+    Lê TODOS os arquivos FASTA de 'Funcao1_Filtrar', 'Funcao2a_Separar' ou 'input'
     e salva os FASTAs individuais em subpastas dentro de 'Funcao2b_FastasIndividuais'.
+    Com 'config.fastas_individuais_formato = "pacote"', cada FASTA vira um único
+    '<nome>.pack.sqlite' na subpasta (os individuais só com 'fastas_individuais_exportar').
     """
     try:
         fasta_files = [f for f in os.listdir(dir_leitura_fasta) if f.endswith(".fasta")]
@@ -21,31 +92,48 @@ def enviar_para_modelagem(dir_leitura_fasta, dir_escrita_model):
 
         pasta_modelagem = dir_escrita_model
         resultados_modelagem = {}
+        empacotar = config.fastas_individuais_formato == "pacote"
 
         for arquivo_fasta in fasta_files:
             print(f"\n  --- Processando arquivo: {arquivo_fasta} ---")
             caminho_fasta = os.path.join(dir_leitura_fasta, arquivo_fasta)
 
-            seqs = list(SeqIO.parse(caminho_fasta, "fasta"))
-            if not seqs:
-                print(f"  Atenção: o arquivo {arquivo_fasta} não contém sequências. Pulando.")
-                continue
-
             nome_base = os.path.splitext(arquivo_fasta)[0]
             subpasta = os.path.join(pasta_modelagem, nome_base)
             os.makedirs(subpasta, exist_ok=True)
 
+            if empacotar:
+                caminho_pacote = os.path.join(subpasta, f"{nome_base}{PACOTE_SUFIXO}")
+                total = gravar_pacote(SeqIO.parse(caminho_fasta, "fasta"), caminho_pacote)
+                if not total:
+                    os.remove(caminho_pacote)
+                    _remover_se_vazia(subpasta)
+                    print(f"  Atenção: o arquivo {arquivo_fasta} não contém sequências. Pulando.")
+                    continue
+                print(f"  {total} sequências empacotadas em: {caminho_pacote}")
+
+                arquivos_individuais = [caminho_pacote]
+                if config.fastas_individuais_exportar:
+                    arquivos_individuais = exportar_pacote(caminho_pacote, subpasta)
+                    print(f"  {len(arquivos_individuais)} arquivos individuais exportados em: {subpasta}")
+                resultados_modelagem[arquivo_fasta] = arquivos_individuais
+                continue
+
             arquivos_individuais = []
 
-            for i, record in enumerate(seqs, start=1):
-                nome_seq = re.sub(r'[^A-Za-z0-9_-]', '_', record.id)
-                arquivo_individual = os.path.join(subpasta, f"{nome_seq}.fasta")
+            for record in SeqIO.parse(caminho_fasta, "fasta"):
+                arquivo_individual = os.path.join(subpasta, f"{nome_individual(record)}.fasta")
 
                 with open(arquivo_individual, 'w') as f:
                     SeqIO.write(record, f, "fasta")
 
                 arquivos_individuais.append(arquivo_individual)
 
+            if not arquivos_individuais:
+                _remover_se_vazia(subpasta)
+                print(f"  Atenção: o arquivo {arquivo_fasta} não contém sequências. Pulando.")
+                continue
+
             print(f"  {len(arquivos_individuais)} arquivos individuais gerados em: {subpasta}")
             resultados_modelagem[arquivo_fasta] = arquivos_individuais
 
@@ -54,4 +142,4 @@ def enviar_para_modelagem(dir_leitura_fasta, dir_escrita_model):
 
     except Exception as e:
         print(f"\nErro ao preparar sequências para modelagem: {e}")
-        return None
\ No newline at end of file
+        return None
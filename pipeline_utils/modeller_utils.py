@@ -5,10 +5,9 @@ Módulo para a Função 7 (Modeller): Rodar o MODELLER.
 
 import os
 import shutil
-from Bio import SeqIO
-from Bio.Seq import Seq 
-from Bio.SeqRecord import SeqRecord 
 import config
+from pipeline_utils import pdb_store_utils
+from pipeline_utils import target_index_utils
 import sys
 import contextlib
 import json 
@@ -29,59 +28,13 @@ class MyAutoModel(AutoModel):
 
 def find_target_sequence(query_key, dir_f2b, dir_f2a, dir_f5=None):
     """
-    Encontra um SeqRecord correspondente ao 'query_key'.
-    Tenta casar o nome exato OU verifica se o query_key é parte do nome do arquivo.
+    Encontra o SeqRecord cujo ID corresponde exatamente ao 'query_key'
+    (nome da pasta da query em 'Funcao6_PDB'), procurando em F5, F2b e F2a,
+    nessa ordem, pelo índice persistente de sequências-alvo.
+    Para muitas queries, prefira 'target_index_utils.buscar_alvos' em lote.
     """
-    
-    # 1. Busca em Funcao5_Consensus
-    if dir_f5 and os.path.exists(dir_f5):
-        pastas_candidatas = []
-        for root, dirs, files in os.walk(dir_f5):
-            if root == dir_f5:
-                for d in dirs:
-                    if query_key in d:
-                        pastas_candidatas.append(os.path.join(root, d))
-            
-            for file in files:
-                if file.endswith(".fasta"):
-                    if query_key in file:
-                        try:
-                            return SeqIO.read(os.path.join(root, file), "fasta")
-                        except Exception: 
-                            try:
-                                for record in SeqIO.parse(os.path.join(root, file), "fasta"):
-                                    return record
-                            except: pass
-
-        for pasta in pastas_candidatas:
-            arquivos = [f for f in os.listdir(pasta) if f.endswith(".fasta")]
-            if arquivos:
-                try:
-                    return SeqIO.read(os.path.join(pasta, arquivos[0]), "fasta")
-                except: pass
-
-    # 2. Busca em Funcao2b_FastasIndividuais
-    if dir_f2b and os.path.exists(dir_f2b):
-        for root, dirs, files in os.walk(dir_f2b):
-            for file in files:
-                if query_key in file and file.endswith(".fasta"):
-                    try:
-                        return SeqIO.read(os.path.join(root, file), "fasta")
-                    except Exception: pass
-
-    # 3. Busca em Funcao2a_Separar
-    if dir_f2a and os.path.exists(dir_f2a):
-        try:
-            for file in os.listdir(dir_f2a):
-                if query_key in file and file.endswith(".fasta"):
-                    try:
-                        for record in SeqIO.parse(os.path.join(dir_f2a, file), "fasta"):
-                            if query_key in record.id: return record
-                            return record
-                    except Exception: pass
-        except Exception: pass
-
-    return None
+    caminho_indice = target_index_utils.atualizar_indice(dir_f5, dir_f2b, dir_f2a)
+    return target_index_utils.buscar_alvos(caminho_indice, [query_key]).get(query_key)
 
 def write_sequence_to_ali(seq_record, ali_file_path, target_code="MtDH"):
     try:
@@ -111,7 +64,7 @@ def get_pdb_resolution(pdb_path):
         return "Erro"
     return "N/A" 
 
-def selecionar_molde_interativo(run_dir):
+def selecionar_molde_interativo(run_dir, modo=None):
     json_path = os.path.join(run_dir, "blast_hits.json")
     pasta_moldes = os.path.join(run_dir, "Moldes")
 
@@ -145,12 +98,14 @@ def selecionar_molde_interativo(run_dir):
 
     print(f"\n  --- Seleção de Molde para esta Proteína ---")
     print(f"  Moldes disponíveis: {len(available_hits)}")
-    print("  Como deseja selecionar o molde?")
-    print("  [1] Automático (Melhor Identidade)") 
-    print("  [2] Manual (Ver lista completa)")
+    if modo is None:
+        print("  Como deseja selecionar o molde?")
+        print("  [1] Automático (Melhor Identidade)") 
+        print("  [2] Manual (Ver lista completa)")
     
     while True:
-        modo = input("  Escolha [1 ou 2]: ").strip()
+        if modo is None:
+            modo = input("  Escolha [1 ou 2]: ").strip()
         if modo == '1':
             melhor = available_hits[0]
             print(f"  -> Selecionado Automaticamente: {melhor['code']} (Cadeia {melhor['chain']}) | Identidade: {melhor['pident']}% | Resolução: {melhor['resolution']} Å")
@@ -179,6 +134,7 @@ def selecionar_molde_interativo(run_dir):
                     print("  Entrada inválida.")
         else:
             print("  Opção inválida. Digite 1 ou 2.")
+            modo = None
 
 def _execute_modeller_core(run_dir, selected_code, selected_chain):
     print(f"\n--- Iniciando Core do Modeller com {selected_code}:{selected_chain} ---")
@@ -222,11 +178,15 @@ def _execute_modeller_core(run_dir, selected_code, selected_chain):
         print(f"\n[ERRO NO CORE] {e}")
         raise e
 
-def run_modelling(dir_f2a, dir_f2b, dir_f5, dir_f6, dir_f7):
+def run_modelling(dir_f2a, dir_f2b, dir_f5, dir_f6, dir_f7, pastas=None, queries=None, modo_molde=None):
     """
     Orquestra o processo de modelagem.
     Inputs: 'Funcao2a_Separar', 'Funcao2b_FastasIndividuais', 'Funcao5_Consensus', 'Funcao6_PDB'.
     Output: 'Funcao7_Modeller'.
+    'pastas' e 'queries' (listas; vazia = todas) e 'modo_molde' ('1' automático,
+    '2' manual) substituem as perguntas correspondentes quando informados.
+    Retorna a lista de (query, motivo) das proteínas que não foram modeladas
+    ([] = todas modeladas), ou None se não havia nenhuma tarefa a executar.
     """
     print("\n--- Iniciando Função 7: MODELLER ---")
     
@@ -240,24 +200,27 @@ def run_modelling(dir_f2a, dir_f2b, dir_f5, dir_f6, dir_f7):
         print(f"Nenhuma pasta encontrada em {dir_f6}. Execute a Função 6 primeiro.")
         return
 
-    print("Qual grupo de PDBs você deseja usar?")
-    print("[0] TODAS as pastas abaixo") 
-    for i, nome_pasta in enumerate(pastas_base, start=1):
-        print(f"[{i}] {nome_pasta}")
-
     pastas_base_selecionadas = []
-    try:
-        escolha_base = input("Digite o número: ").strip()
-        if escolha_base == "0":
-            pastas_base_selecionadas = pastas_base
-        elif 1 <= int(escolha_base) <= len(pastas_base):
-            pastas_base_selecionadas.append(pastas_base[int(escolha_base) - 1])
-        else:
-            print("Seleção inválida.")
+    if pastas is not None:
+        pastas_base_selecionadas = [p for p in pastas_base if not pastas or p in pastas]
+    else:
+        print("Qual grupo de PDBs você deseja usar?")
+        print("[0] TODAS as pastas abaixo") 
+        for i, nome_pasta in enumerate(pastas_base, start=1):
+            print(f"[{i}] {nome_pasta}")
+
+        try:
+            escolha_base = input("Digite o número: ").strip()
+            if escolha_base == "0":
+                pastas_base_selecionadas = pastas_base
+            elif 1 <= int(escolha_base) <= len(pastas_base):
+                pastas_base_selecionadas.append(pastas_base[int(escolha_base) - 1])
+            else:
+                print("Seleção inválida.")
+                return
+        except ValueError:
+            print("Entrada inválida.")
             return
-    except ValueError:
-        print("Entrada inválida.")
-        return
     
     query_jobs_to_run = [] 
     
@@ -273,6 +236,13 @@ def run_modelling(dir_f2a, dir_f2b, dir_f5, dir_f6, dir_f7):
         if not pastas_query_nomes:
             continue
 
+        if queries is not None:
+            for query_key in pastas_query_nomes:
+                if not queries or query_key in queries:
+                    template_source_path = os.path.join(dir_base_selecionada, query_key)
+                    query_jobs_to_run.append((query_key, template_source_path, nome_pasta_base))
+            continue
+
         print("Qual proteína (query) você deseja modelar?")
         print("[0] TODAS as proteínas abaixo")
         for i, nome_pasta in enumerate(pastas_query_nomes, start=1):
@@ -296,21 +266,27 @@ def run_modelling(dir_f2a, dir_f2b, dir_f5, dir_f6, dir_f7):
             
     if not query_jobs_to_run:
         print("\nNenhuma tarefa selecionada.")
-        return
+        return None
         
     print(f"\nIniciando {len(query_jobs_to_run)} tarefa(s)...")
     
     original_cwd = os.getcwd() 
     
+    # Índice construído/atualizado uma vez; cada query vira uma consulta ao dicionário.
+    caminho_indice = target_index_utils.atualizar_indice(dir_f5, dir_f2b, dir_f2a)
+    alvos = target_index_utils.buscar_alvos(caminho_indice, [job[0] for job in query_jobs_to_run])
+    falhas = []
+    
     for query_key, template_source_path, nome_pasta_base in query_jobs_to_run:
         
         print(f"\n==================================================")
         print(f"PROCESSANDO: {query_key}")
         print(f"==================================================")
         
-        target_seq_record = find_target_sequence(query_key, dir_f2b, dir_f2a, dir_f5)
+        target_seq_record = alvos.get(query_key)
         if target_seq_record is None:
             print(f"[ERRO] Alvo não encontrado em F2b, F5 ou F2a para '{query_key}'. Pulando.")
+            falhas.append((query_key, "sequência-alvo não encontrada"))
             continue
         
         print(f"  -> Alvo encontrado: {target_seq_record.id}")
@@ -329,26 +305,37 @@ def run_modelling(dir_f2a, dir_f2b, dir_f5, dir_f6, dir_f7):
         
         if not os.path.exists(json_source_path):
             print(f"  [ERRO] 'blast_hits.json' não encontrado na origem. Pulando.")
+            falhas.append((query_key, "'blast_hits.json' não encontrado"))
             continue
         
         try:
             shutil.copy2(json_source_path, json_dest_path)
+            vinculos = []
             for file in os.listdir(template_source_path):
                 if file.endswith(".pdb"):
-                    shutil.copy2(os.path.join(template_source_path, file),
-                                os.path.join(template_dest_path, file))
+                    caminho_pdb = os.path.join(template_source_path, file)
+                    # Moldes do repositório viram vínculos (sem duplicar o arquivo em disco).
+                    if config.pdb_store and pdb_store_utils.esta_no_repositorio(caminho_pdb):
+                        vinculos.append((os.path.splitext(file)[0], template_dest_path))
+                    else:
+                        shutil.copy2(caminho_pdb, os.path.join(template_dest_path, file))
+            if vinculos:
+                pdb_store_utils.vincular(vinculos)
         except Exception as e:
             print(f"  [ERRO] Falha ao copiar arquivos: {e}. Pulando.")
+            falhas.append((query_key, f"falha ao copiar moldes: {e}"))
             continue
         
         ali_file_path = os.path.join(run_dir, "MtDH.ali")
         if not write_sequence_to_ali(target_seq_record, ali_file_path, "MtDH"):
+            falhas.append((query_key, "falha ao gravar o arquivo .ali"))
             continue
 
-        selected_code, selected_chain = selecionar_molde_interativo(run_dir)
+        selected_code, selected_chain = selecionar_molde_interativo(run_dir, modo_molde)
         
         if not selected_code:
             print("  [Abortado] Nenhum molde selecionado. Pulando esta proteína.")
+            falhas.append((query_key, "nenhum molde selecionado"))
             continue
 
         log_file_path = os.path.join(run_dir, "saida.log")
@@ -365,6 +352,7 @@ def run_modelling(dir_f2a, dir_f2b, dir_f5, dir_f6, dir_f7):
         except Exception as e:
             print(f"  [ERRO GERAL] Falha na execução do Modeller. Detalhes: {e}")
             os.chdir(original_cwd) 
+            falhas.append((query_key, f"falha na execução do MODELLER: {e}"))
             continue
         
         os.chdir(run_dir) 
@@ -400,13 +388,22 @@ def run_modelling(dir_f2a, dir_f2b, dir_f5, dir_f6, dir_f7):
                         print(f"  -> Melhor modelo copiado: {nome_destino} (DOPE: {valor_dope})")
                     else:
                         print(f"  -> [Erro] Arquivo {nome_arquivo_modelo} não encontrado em {output_folder}.")
+                        falhas.append((query_key, f"modelo {nome_arquivo_modelo} não encontrado"))
                 else:
                     print("  -> Nenhum modelo gerado com sucesso.")
+                    falhas.append((query_key, "nenhum modelo gerado com sucesso"))
             else:
                 print("  -> Lista de outputs do Modeller vazia.")
+                falhas.append((query_key, "MODELLER não gerou modelos"))
         except Exception as e:
             print(f"  -> Erro ao copiar melhores resultados: {e}")
+            falhas.append((query_key, f"erro ao copiar o melhor modelo: {e}"))
 
         os.chdir(original_cwd)
             
-    print(f"\n--- Função 7 (MODELLER) concluída ---")
\ No newline at end of file
+    print(f"\n--- Função 7 (MODELLER) concluída ---")
+    if falhas:
+        print(f"[Atenção] {len(falhas)} proteína(s) não modelada(s):")
+        for query_key, motivo in falhas:
+            print(f"  - {query_key}: {motivo}")
+    return falhas
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Módulo de apoio às Funções 6/7: repositório único de moldes PDB.
+Cada código é baixado uma única vez para 'config.pdb_store_dir'; as pastas
+das queries (Funcao6_PDB) e os 'Moldes' do MODELLER recebem hard links
+(ou symlinks/cópias, se o sistema não permitir) e cada vínculo é
+registrado num SQLite, que serve de contagem de referências para a limpeza.
+"""
+
+import os
+import shutil
+import sqlite3
+import config
+
+def caminho_no_repositorio(code):
+    """Caminho do molde no repositório: <store>/<2 caracteres do meio>/<CODIGO>.pdb."""
+    code = code.strip().upper()
+    return os.path.join(config.pdb_store_dir, code[1:3].lower(), f"{code}.pdb")
+
+def _abrir_registro():
+    os.makedirs(config.pdb_store_dir, exist_ok=True)
+    conexao = sqlite3.connect(os.path.join(config.pdb_store_dir, "referencias.sqlite"))
+    conexao.execute("CREATE TABLE IF NOT EXISTS moldes (code TEXT PRIMARY KEY)")
+    conexao.execute("CREATE TABLE IF NOT EXISTS vinculos (destino TEXT PRIMARY KEY, code TEXT NOT NULL)")
+    return conexao
+
+def _criar_vinculo(origem, destino):
+    """
+    Cria 'destino' apontando para 'origem': hard link, senão symlink,
+    senão cópia. Substitui 'destino' atomicamente se já existir.
+    Retorna o tipo de vínculo criado.
+    """
+    temporario = destino + ".link"
+    if os.path.lexists(temporario):
+        os.remove(temporario)
+    try:
+        os.link(origem, temporario)
+        tipo = "hardlink"
+    except OSError:
+        try:
+            os.symlink(os.path.abspath(origem), temporario)
+            tipo = "symlink"
+        except OSError:
+            shutil.copy2(origem, temporario)
+            tipo = "copia"
+    os.replace(temporario, destino)
+    return tipo
+
+def vincular(codes_destinos):
+    """
+    Vincula cada (código, pasta) ao molde do repositório, criando
+    '<pasta>/<CODIGO>.pdb'. Códigos ausentes do repositório são ignorados.
+    Retorna quantos vínculos foram criados.
+    """
+    conexao = _abrir_registro()
+    criados = 0
+    try:
+        for code, pasta in codes_destinos:
+            code = code.strip().upper()
+            origem = caminho_no_repositorio(code)
+            if not os.path.exists(origem):
+                continue
+            conexao.execute("INSERT OR IGNORE INTO moldes (code) VALUES (?)", (code,))
+
+            os.makedirs(pasta, exist_ok=True)
+            destino = os.path.abspath(os.path.join(pasta, f"{code}.pdb"))
+            if not (os.path.exists(destino) and os.path.samefile(origem, destino)):
+                _criar_vinculo(origem, destino)
+            conexao.execute("INSERT OR REPLACE INTO vinculos VALUES (?, ?)", (destino, code))
+            criados += 1
+        conexao.commit()
+    finally:
+        conexao.close()
+    return criados
+
+def esta_no_repositorio(caminho_pdb):
+    """True se 'caminho_pdb' é (ou aponta para) o molde do repositório."""
+    code = os.path.splitext(os.path.basename(caminho_pdb))[0]
+    origem = caminho_no_repositorio(code)
+    return os.path.exists(origem) and os.path.samefile(origem, caminho_pdb)
+
+def limpar_repositorio():
+    """
+    Remove do registro os vínculos cujo arquivo já não existe e apaga do
+    repositório os moldes sem nenhuma referência. Retorna (vínculos removidos,
+    moldes removidos).
+    """
+    conexao = _abrir_registro()
+    try:
+        orfaos = [d for (d,) in conexao.execute("SELECT destino FROM vinculos") if not os.path.lexists(d)]
+        conexao.executemany("DELETE FROM vinculos WHERE destino = ?", ((d,) for d in orfaos))
+
+        sem_referencia = [c for (c,) in conexao.execute(
+            "SELECT code FROM moldes WHERE code NOT IN (SELECT code FROM vinculos)"
+        )]
+        for code in sem_referencia:
+            caminho = caminho_no_repositorio(code)
+            if os.path.exists(caminho):
+                os.remove(caminho)
+        conexao.executemany("DELETE FROM moldes WHERE code = ?", ((c,) for c in sem_referencia))
+        conexao.commit()
+    finally:
+        conexao.close()
+    print(f"Repositório de moldes: {len(orfaos)} vínculo(s) órfão(s) e {len(sem_referencia)} molde(s) sem referência removidos.")
+    return len(orfaos), len(sem_referencia)
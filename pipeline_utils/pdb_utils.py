@@ -1,7 +1,7 @@
 """
 Módulo para a Função 5: Extrair códigos PDB, salvar scores do BLAST 
 e baixar os arquivos .pdb, agrupados por proteína (query).
-(Versão Otimizada: Downloads paralelos com 10 threads)
+(Versão Otimizada: um único pool de downloads, com sessão HTTP compartilhada)
 """
 
 import os
@@ -9,74 +9,261 @@ import pandas as pd
 import requests 
 import time     
 import json 
+import zlib
+import gzip
+import shutil
+import threading
 import concurrent.futures
+from requests.adapters import HTTPAdapter
+import config
+from pipeline_utils import pdb_store_utils
 
-def _download_worker(code, pasta_saida_especifica):
+# Erros HTTP considerados transitórios (vale tentar de novo).
+STATUS_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+class _LimiteDeTaxa:
+    """
+    Espaça o início das requisições para no máximo 'por_segundo'
+    por segundo, somando todas as threads (0 = sem limite).
+    """
+    def __init__(self, por_segundo):
+        self.intervalo = 1 / por_segundo if por_segundo else 0
+        self.proximo = 0.0
+        self.lock = threading.Lock()
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        with self.lock:
+            agora = time.monotonic()
+            espera = self.proximo - agora
+            self.proximo = max(agora, self.proximo) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+def _criar_sessao():
+    """
+    Sessão HTTP única para toda a etapa, com um pool de conexões
+    do tamanho do número de downloads simultâneos.
+    """
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, config.pdb_max_downloads))
+    sessao.mount("http://", adaptador)
+    sessao.mount("https://", adaptador)
+    return sessao
+
+def _baixar_para_arquivo(sessao, limite, url, destino):
+    """
+    Baixa 'url' em streaming para 'destino' + '.part', descompactando gzip
+    no caminho, e só então renomeia para 'destino'. Tenta de novo erros
+    transitórios com espera crescente. Retorna False se o arquivo não existe (404).
+    """
+    temporario = destino + ".part"
+    espera = config.pdb_backoff_inicial
+    for tentativa in range(1, config.pdb_tentativas + 1):
+        limite.aguardar()
+        try:
+            with sessao.get(url, stream=True, timeout=config.pdb_timeout) as r:
+                if r.status_code == 404:
+                    return False
+                if r.status_code in STATUS_TRANSITORIOS:
+                    raise requests.exceptions.HTTPError(f"HTTP {r.status_code}", response=r)
+                r.raise_for_status()
+
+                descompactador = None
+                with open(temporario, 'wb') as f:
+                    for bloco in r.iter_content(chunk_size=64 * 1024):
+                        if descompactador is None:
+                            # Arquivos .gz podem chegar já descompactados (Content-Encoding: gzip).
+                            descompactador = zlib.decompressobj(16 + zlib.MAX_WBITS) if bloco[:2] == b"\x1f\x8b" else False
+                        f.write(descompactador.decompress(bloco) if descompactador else bloco)
+                    if descompactador:
+                        f.write(descompactador.flush())
+            os.replace(temporario, destino)
+            return True
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError, requests.exceptions.HTTPError) as e:
+            transitorio = not isinstance(e, requests.exceptions.HTTPError) or (
+                e.response is not None and e.response.status_code in STATUS_TRANSITORIOS)
+            if not transitorio or tentativa == config.pdb_tentativas:
+                raise
+            time.sleep(espera)
+            espera *= 2
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+def _copiar_do_espelho(code, destino):
+    """
+    Procura o código no espelho local do PDB (layout 'divided':
+    '<espelho>/xy/pdb1xyz.ent.gz') e descompacta direto para 'destino'.
+    Retorna False se o espelho não estiver configurado ou não tiver o código.
+    """
+    if not config.pdb_espelho_dir:
+        return False
+    code = code.lower()
+    origem = os.path.join(config.pdb_espelho_dir, code[1:3], f"pdb{code}.ent.gz")
+    if not os.path.exists(origem):
+        return False
+
+    temporario = destino + ".part"
+    try:
+        with gzip.open(origem, 'rb') as entrada, open(temporario, 'wb') as saida:
+            shutil.copyfileobj(entrada, saida, 1024 * 1024)
+        os.replace(temporario, destino)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return True
+
+def _download_worker(sessao, limite, code, pasta_saida_especifica):
     """
     Função auxiliar executada por cada thread para baixar um arquivo.
+    Usa primeiro o espelho local ('config.pdb_espelho_dir'), se houver;
+    na rede, prefere o '.pdb.gz' (menos bytes) e cai para o '.pdb' se não houver.
+    Retorna True se o arquivo está disponível ao final.
     """
     code = code.strip().upper()
     if not code:
-        return
+        return False
 
-    url = f"https://files.rcsb.org/download/{code}.pdb"
     caminho_pdb_out = os.path.join(pasta_saida_especifica, f"{code}.pdb")
 
     if os.path.exists(caminho_pdb_out):
         print(f"    -> {code}.pdb já existe. Pulando.")
-        return
+        return True
 
+    base = config.pdb_base_url.rstrip("/")
     try:
-        r = requests.get(url, timeout=15)
-        r.raise_for_status() 
-        
-        with open(caminho_pdb_out, 'w') as f_pdb:
-            f_pdb.write(r.text)
-        print(f"    -> {code}.pdb baixado com sucesso.")
+        os.makedirs(pasta_saida_especifica, exist_ok=True)
+        if _copiar_do_espelho(code, caminho_pdb_out):
+            print(f"    -> {code}.pdb copiado do espelho local.")
+            return True
+        if config.pdb_espelho_dir and not config.pdb_espelho_usar_rede:
+            print(f"    -> Falha ao obter {code}.pdb (ausente no espelho local e rede desativada)")
+            return False
+        for url in (f"{base}/{code}.pdb.gz", f"{base}/{code}.pdb"):
+            if _baixar_para_arquivo(sessao, limite, url, caminho_pdb_out):
+                print(f"    -> {code}.pdb baixado com sucesso.")
+                return True
+        print(f"    -> Falha ao baixar {code}.pdb (não encontrado no servidor)")
 
     except requests.exceptions.RequestException as e:
         print(f"    -> Falha ao baixar {code}.pdb (Erro: {e})")
     except Exception as e:
         print(f"    -> Erro desconhecido em {code}: {e}")
+    return False
 
-def baixar_pdb_files(codigos_pdb_set, pasta_saida_especifica):
+def baixar_pdbs_em_lote(downloads):
     """
-    Baixa uma lista/set de códigos PDB para uma pasta de saída específica
-    usando até 10 threads simultâneas.
+    Baixa todos os pares (código, pasta de saída) com um único pool de
+    até 'config.pdb_max_downloads' threads e uma única sessão HTTP.
+    Com 'config.pdb_store', cada código é baixado uma única vez para o
+    repositório de moldes e as pastas de saída recebem vínculos para ele.
+    Retorna a lista (ordenada) dos códigos que não puderam ser obtidos.
     """
-    try:
-        os.makedirs(pasta_saida_especifica, exist_ok=True)
-        
-        if not codigos_pdb_set:
-            print("  -> Nenhum código PDB para baixar neste grupo.")
-            return
+    downloads = sorted(set((c.strip().upper(), pasta) for c, pasta in downloads if c.strip()))
+    if not downloads:
+        return []
 
-        lista_codigos = sorted(list(codigos_pdb_set))
-        total = len(lista_codigos)
-        print(f"  -> Iniciando download de {total} PDBs em '{os.path.basename(pasta_saida_especifica)}' (10 threads)...")
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+    destinos = downloads
+    if config.pdb_store:
+        destinos = sorted({
+            (code, os.path.dirname(pdb_store_utils.caminho_no_repositorio(code))) for code, _ in downloads
+        })
+
+    print(f"\n--- Baixando {len(destinos)} PDB(s) (até {config.pdb_max_downloads} simultâneos) ---")
+    sessao = _criar_sessao()
+    limite = _LimiteDeTaxa(config.pdb_requisicoes_por_segundo)
+    falhas = set()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, config.pdb_max_downloads)) as executor:
             future_to_code = {
-                executor.submit(_download_worker, code, pasta_saida_especifica): code 
-                for code in lista_codigos
+                executor.submit(_download_worker, sessao, limite, code, pasta): code for code, pasta in destinos
             }
-            
             for future in concurrent.futures.as_completed(future_to_code):
                 try:
-                    future.result()
+                    if not future.result():
+                        falhas.add(future_to_code[future])
                 except Exception as exc:
                     print(f"    -> Uma thread falhou: {exc}")
+                    falhas.add(future_to_code[future])
+    finally:
+        sessao.close()
 
+    if config.pdb_store:
+        vinculados = pdb_store_utils.vincular(downloads)
+        print(f"  -> {vinculados} molde(s) vinculados às pastas das queries a partir de '{config.pdb_store_dir}'.")
+    return sorted(falhas)
+
+def baixar_pdb_files(codigos_pdb_set, pasta_saida_especifica):
+    """
+    Baixa uma lista/set de códigos PDB para uma pasta de saída específica.
+    """
+    try:
+        os.makedirs(pasta_saida_especifica, exist_ok=True)
+        
+        if not codigos_pdb_set:
+            print("  -> Nenhum código PDB para baixar neste grupo.")
+            return
+
+        print(f"  -> Iniciando download de {len(codigos_pdb_set)} PDBs em '{os.path.basename(pasta_saida_especifica)}'...")
+        baixar_pdbs_em_lote((code, pasta_saida_especifica) for code in codigos_pdb_set)
         print("  -> Todos os downloads para este grupo foram processados.")
 
     except Exception as e:
         print(f"  -> Erro inesperado no gerenciador de downloads: {e}")
 
+def nome_pasta_query(query_id):
+    """Nome da pasta de uma query em 'Funcao6_PDB' (só letras, números, '_' e '-'; até 100 caracteres)."""
+    nome_pasta = "".join(c for c in query_id if c.isalnum() or c in ('_', '-')).rstrip()
+    return nome_pasta[:100]
+
+def _melhores_hits_pdb(df):
+    """
+    Separa os hits no formato 'pdb|CODIGO|CADEIA' (coluna 1) da tabela inteira
+    de uma vez e escolhe, para cada (query, código), a linha de menor e-value
+    (a primeira delas, em empate). Retorna {query: {código: dados do hit}},
+    com os códigos na ordem em que aparecem no BLAST.
+    """
+    partes = df[1].astype(str).str.split('|', n=3, expand=True).reindex(columns=range(3))
+    eh_pdb = (partes[0] == 'pdb') & partes[2].notna()
+    hits = pd.DataFrame({
+        "query": df.loc[eh_pdb, 0],
+        "code": partes.loc[eh_pdb, 1],
+        "chain": partes.loc[eh_pdb, 2],
+        "evalue": df.loc[eh_pdb, 4],
+        "bitscore": df.loc[eh_pdb, 5],
+        "pident": df.loc[eh_pdb, 2],
+    })
+    if hits.empty:
+        return {}
+
+    # groupby sem ordenar mantém os grupos na ordem da primeira aparição;
+    # idxmin devolve a primeira linha com o menor e-value de cada grupo.
+    e_values = pd.to_numeric(hits["evalue"], errors='coerce').fillna(float("inf"))
+    indices = e_values.groupby([hits["query"], hits["code"]], sort=False).idxmin()
+    melhores = hits.loc[indices.to_numpy()]
+
+    resultado = {}
+    for query, code, chain, evalue, bitscore, pident in zip(
+        *(melhores[c].tolist() for c in ("query", "code", "chain", "evalue", "bitscore", "pident"))
+    ):
+        resultado.setdefault(query, {})[code] = {
+            "chain": chain,
+            "evalue": evalue,
+            "bitscore": bitscore,
+            "pident": pident
+        }
+    return resultado
+
 def extrair_pdb_codes(dir_leitura_blast, dir_escrita_pdb):
     """
     Varre 'Funcao3_Blastp', agrupa hits por proteína (Coluna A),
     salva um 'blast_hits.json' com os scores E A CADEIA, e baixa os PDBs
-    para 'Funcao6_PDB'.
+    para 'Funcao6_PDB' (todos de uma vez, no final).
+    Retorna a lista de (item, erro) do que falhou (arquivos .tsv, JSONs ou
+    downloads; [] = tudo certo), ou None se não houver nenhum .tsv.
     """
     
     arquivos_tsv_encontrados = []
@@ -90,11 +277,13 @@ def extrair_pdb_codes(dir_leitura_blast, dir_escrita_pdb):
     if not arquivos_tsv_encontrados:
         print(f"Nenhum arquivo .tsv encontrado em '{dir_leitura_blast}'.")
         print("Execute a Função 2 (BLASTp) primeiro.")
-        return
+        return None
 
     print(f"Encontrados {len(arquivos_tsv_encontrados)} arquivos .tsv para processar...\n")
     
     total_proteinas_processadas = 0
+    downloads = []
+    falhas = []
 
     for caminho_tsv in arquivos_tsv_encontrados:
         arquivo_base = os.path.basename(caminho_tsv)
@@ -115,45 +304,24 @@ def extrair_pdb_codes(dir_leitura_blast, dir_escrita_pdb):
                 print(f"  -> Aviso: Arquivo {arquivo_base} não parece ter 6+ colunas. Pulando.")
                 continue
             
-            grupos_de_proteinas = df.groupby(0)
-            
-            print(f"  -> Encontradas {len(grupos_de_proteinas)} proteínas (queries) neste arquivo.")
-            total_proteinas_processadas += len(grupos_de_proteinas)
+            melhores_hits = _melhores_hits_pdb(df)
+            queries = df[0].dropna().drop_duplicates().sort_values().tolist()
+
+            print(f"  -> Encontradas {len(queries)} proteínas (queries) neste arquivo.")
+            total_proteinas_processadas += len(queries)
 
-            for query_id, group_df in grupos_de_proteinas:
+            for query_id in queries:
                 
-                nome_pasta_proteina = "".join(
-                    c for c in query_id if c.isalnum() or c in ('_', '-')
-                ).rstrip()
-                if len(nome_pasta_proteina) > 100: 
-                    nome_pasta_proteina = nome_pasta_proteina[:100]
+                nome_pasta_proteina = nome_pasta_query(query_id)
 
                 print(f"\n    Processando Query: {query_id}")
 
                 pasta_saida_proteina = os.path.join(pasta_saida_base_tsv, nome_pasta_proteina)
                 os.makedirs(pasta_saida_proteina, exist_ok=True)
                 
-                codigos_neste_grupo = set()
-                hits_data = {} 
-
-                for index, row in group_df.iterrows():
-                    hit_string = str(row[1])
-                    parts = hit_string.split('|')
-                    
-                    if len(parts) >= 3 and parts[0] == 'pdb': 
-                        pdb_code = parts[1]
-                        chain = parts[2]
-                        codigos_neste_grupo.add(pdb_code)
-                        
-                        if (pdb_code not in hits_data) or (row[4] < hits_data[pdb_code]["evalue"]):
-                            hits_data[pdb_code] = {
-                                "chain": chain,
-                                "evalue": row[4],
-                                "bitscore": row[5],
-                                "pident": row[2]
-                            }
+                hits_data = melhores_hits.get(query_id, {})
                 
-                if codigos_neste_grupo:
+                if hits_data:
                     json_path = os.path.join(pasta_saida_proteina, 'blast_hits.json')
                     try:
                         with open(json_path, 'w') as f:
@@ -161,8 +329,9 @@ def extrair_pdb_codes(dir_leitura_blast, dir_escrita_pdb):
                         print(f"    -> 'blast_hits.json' (com cadeias) salvo em '{os.path.basename(pasta_saida_proteina)}'")
                     except Exception as e:
                         print(f"    -> Erro ao salvar JSON: {e}")
+                        falhas.append((json_path, str(e)))
                     
-                    baixar_pdb_files(codigos_neste_grupo, pasta_saida_proteina)
+                    downloads += [(code, pasta_saida_proteina) for code in hits_data]
                 else:
                     print(f"    -> Nenhum código PDB no formato pdb|CODIGO|CADEIA encontrado.")
 
@@ -170,6 +339,20 @@ def extrair_pdb_codes(dir_leitura_blast, dir_escrita_pdb):
             print(f"  -> Aviso: Arquivo {arquivo_base} está vazio. Pulando.")
         except Exception as e:
             print(f"  -> Erro ao processar {arquivo_base}: {e}")
+            falhas.append((caminho_tsv, str(e)))
+
+    # Um único pool (e uma única sessão HTTP) para os downloads de todas as queries.
+    falhas += [(f"{code}.pdb", "download falhou") for code in baixar_pdbs_em_lote(downloads)]
+
+    if config.pdb_store:
+        # Os moldes desta execução já estão vinculados; sai do repositório só o
+        # que nenhuma pasta (Funcao6_PDB ou Moldes da Funcao7) usa mais.
+        pdb_store_utils.limpar_repositorio()
 
     print(f"\nExtração e download de PDB concluídos. {total_proteinas_processadas} queries processadas.")
-    print(f"Resultados salvos em subpastas dentro de: {dir_escrita_pdb}\n")
\ No newline at end of file
+    print(f"Resultados salvos em subpastas dentro de: {dir_escrita_pdb}\n")
+    if falhas:
+        print(f"[Atenção] {len(falhas)} falha(s) na Função 6:")
+        for item, erro in falhas:
+            print(f"  - {item}: {erro}")
+    return falhas
\ No newline at end of file
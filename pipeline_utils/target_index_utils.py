@@ -0,0 +1,124 @@
+"""
+Módulo de apoio à Função 7: índice persistente das sequências-alvo.
+Mapeia o nome exato da pasta de cada query em 'Funcao6_PDB' para a sua
+sequência em 'Funcao5_Consensus', 'Funcao2b_FastasIndividuais' (arquivos
+ou pacotes) ou 'Funcao2a_Separar', nessa ordem de prioridade. A cada
+execução só os arquivos novos ou alterados (tamanho/data) são relidos.
+"""
+
+import os
+import sqlite3
+from Bio import SeqIO
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
+import config
+from pipeline_utils import model_utils
+from pipeline_utils.pdb_utils import nome_pasta_query
+
+# Prioridade de cada fonte (menor = preferida).
+F5, F2B, F2A = 0, 1, 2
+
+def _listar_fontes(dir_f5, dir_f2b, dir_f2a):
+    """Retorna {caminho: (fonte, tamanho, mtime)} de todos os arquivos de sequências."""
+    arquivos = {}
+
+    def adicionar(caminho, fonte):
+        estado = os.stat(caminho)
+        arquivos.setdefault(os.path.abspath(caminho), (fonte, estado.st_size, estado.st_mtime_ns))
+
+    for fonte, diretorio, sufixos in ((F5, dir_f5, (".fasta",)),
+                                      (F2B, dir_f2b, (".fasta", model_utils.PACOTE_SUFIXO))):
+        if diretorio and os.path.exists(diretorio):
+            for root, dirs, files in os.walk(diretorio):
+                for file in files:
+                    if file.endswith(sufixos):
+                        adicionar(os.path.join(root, file), fonte)
+
+    if dir_f2a and os.path.exists(dir_f2a):
+        for file in os.listdir(dir_f2a):
+            if file.endswith(".fasta"):
+                adicionar(os.path.join(dir_f2a, file), F2A)
+    return arquivos
+
+def _registros(caminho):
+    if caminho.endswith(model_utils.PACOTE_SUFIXO):
+        return (record for _, record in model_utils.listar_pacote(caminho))
+    return SeqIO.parse(caminho, "fasta")
+
+def _abrir_indice(caminho_indice):
+    os.makedirs(os.path.dirname(caminho_indice) or ".", exist_ok=True)
+    conexao = sqlite3.connect(caminho_indice)
+    try:
+        conexao.execute("CREATE TABLE IF NOT EXISTS arquivos (caminho TEXT PRIMARY KEY, fonte INTEGER, tamanho INTEGER, mtime INTEGER)")
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS alvos (chave TEXT NOT NULL, fonte INTEGER, caminho TEXT NOT NULL, "
+            "ordem INTEGER, id TEXT NOT NULL, descricao TEXT NOT NULL, seq TEXT NOT NULL)"
+        )
+        conexao.execute("CREATE INDEX IF NOT EXISTS alvos_chave ON alvos (chave, fonte, caminho, ordem)")
+    except sqlite3.DatabaseError:
+        # Índice corrompido: recomeça do zero.
+        conexao.close()
+        os.remove(caminho_indice)
+        return _abrir_indice(caminho_indice)
+    return conexao
+
+def atualizar_indice(dir_f5, dir_f2b, dir_f2a, caminho_indice=None):
+    """
+    Garante que o índice reflete o estado atual das pastas: remove os arquivos
+    apagados ou alterados e (re)lê só os novos ou alterados.
+    Retorna o caminho do índice.
+    """
+    caminho_indice = caminho_indice or config.modeller_indice_alvos
+    atuais = _listar_fontes(dir_f5, dir_f2b, dir_f2a)
+
+    conexao = _abrir_indice(caminho_indice)
+    try:
+        registrados = {c: (f, t, m) for c, f, t, m in conexao.execute("SELECT caminho, fonte, tamanho, mtime FROM arquivos")}
+        obsoletos = [c for c, assinatura in registrados.items() if atuais.get(c) != assinatura]
+        novos = sorted(c for c, assinatura in atuais.items() if registrados.get(c) != assinatura)
+
+        for caminho in obsoletos:
+            conexao.execute("DELETE FROM alvos WHERE caminho = ?", (caminho,))
+            conexao.execute("DELETE FROM arquivos WHERE caminho = ?", (caminho,))
+
+        if novos:
+            print(f"  Indexando sequências-alvo de {len(novos)} arquivo(s)...")
+        for caminho in novos:
+            fonte, tamanho, mtime = atuais[caminho]
+            try:
+                conexao.executemany(
+                    "INSERT INTO alvos VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ((nome_pasta_query(r.id), fonte, caminho, i, r.id, r.description, str(r.seq))
+                     for i, r in enumerate(_registros(caminho)))
+                )
+            except Exception as e:
+                print(f"  [Aviso] Não foi possível indexar '{caminho}': {e}")
+                conexao.execute("DELETE FROM alvos WHERE caminho = ?", (caminho,))
+            conexao.execute("INSERT INTO arquivos VALUES (?, ?, ?, ?)", (caminho, fonte, tamanho, mtime))
+        conexao.commit()
+    finally:
+        conexao.close()
+    return caminho_indice
+
+def buscar_alvos(caminho_indice, chaves):
+    """
+    Retorna {chave: SeqRecord} para as chaves (nomes das pastas das queries)
+    presentes no índice. Em chaves repetidas vale a fonte de maior prioridade
+    e, dentro dela, o primeiro arquivo (ordem alfabética) e o primeiro registro.
+    """
+    chaves = list(dict.fromkeys(chaves))
+    alvos = {}
+    conexao = sqlite3.connect(caminho_indice)
+    try:
+        for i in range(0, len(chaves), 900):
+            lote = chaves[i:i + 900]
+            marcadores = ",".join("?" * len(lote))
+            for chave, id_seq, descricao, seq in conexao.execute(
+                f"SELECT chave, id, descricao, seq FROM alvos WHERE chave IN ({marcadores}) "
+                "ORDER BY fonte, caminho, ordem", lote
+            ):
+                if chave not in alvos:
+                    alvos[chave] = SeqRecord(Seq(seq), id=id_seq, name=id_seq, description=descricao)
+    finally:
+        conexao.close()
+    return alvos